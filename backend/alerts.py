@@ -0,0 +1,58 @@
+"""
+Уведомления покупателей о новых автомобилях под их сохраненные предпочтения.
+
+Потребитель событий outbox car.created: новые автомобили пачки загружаются
+одним запросом и сопоставляются с покупателями через индекс предпочтений
+(backend.matching) — без перебора таблицы buyers. Каждый покупатель получает
+одно уведомление на пачку со всеми подходящими автомобилями. Уведомления
+записываются в транзакции диспетчера, поэтому повторная доставка пачки
+после ошибки не создает дублей.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.schemas import Car, Notification, OutboxEvent
+from backend.matching import buyer_matcher, CarSpec
+
+NEW_CARS_NOTIFICATION = "new_cars"
+
+
+async def notify_matching_buyers(db: AsyncSession, events: List[OutboxEvent]):
+    """Создать уведомления о новых активных автомобилях для подходящих покупателей"""
+    car_ids = sorted({event.aggregate_id for event in events})
+    rows = await db.execute(
+        select(
+            Car.id, Car.brand, Car.model, Car.year, Car.power,
+            Car.transmission, Car.condition, Car.price
+        )
+        .where(Car.id.in_(car_ids), Car.status == "active")
+    )
+    specs = [CarSpec.from_car(row) for row in rows]
+    if not specs:
+        return
+
+    await buyer_matcher.ensure_loaded(db)
+    # Покупатели без единого критерия не подписаны на подборку
+    matches = buyer_matcher.match_many(specs, with_criteria_only=True)
+
+    cars_by_buyer: Dict[int, List[int]] = defaultdict(list)
+    for car_id, buyer_ids in matches.items():
+        for buyer_id in buyer_ids:
+            cars_by_buyer[buyer_id].append(car_id)
+    if not cars_by_buyer:
+        return
+
+    created_at = datetime.utcnow()
+    await db.execute(insert(Notification), [
+        {
+            "buyer_id": buyer_id,
+            "kind": NEW_CARS_NOTIFICATION,
+            "car_ids": sorted(buyer_car_ids),
+            "created_at": created_at,
+        }
+        for buyer_id, buyer_car_ids in sorted(cars_by_buyer.items())
+    ])
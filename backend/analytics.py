@@ -0,0 +1,129 @@
+"""
+Анализ рынка: агрегаты считаются в SQL, результат может кэшироваться
+в таблице market_snapshots фоновой задачей.
+
+Обработчики, меняющие автомобили и покупателей, удаляют снимок в своей
+транзакции (mark_market_snapshot_stale), поэтому устаревший снимок не
+отдается: до следующего обновления анализ считается по текущим данным.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from os import environ
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.schemas import Buyer, Car, MarketSnapshot
+from backend.schemas.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Период обновления снимка в секундах (0 — фоновое обновление выключено)
+MARKET_SNAPSHOT_REFRESH_SECONDS = float(environ.get("MARKET_SNAPSHOT_REFRESH_SECONDS", "0"))
+# Максимальный возраст снимка, после которого анализ считается заново
+MARKET_SNAPSHOT_MAX_AGE_SECONDS = float(environ.get("MARKET_SNAPSHOT_MAX_AGE_SECONDS", "300"))
+
+SNAPSHOT_ID = 1
+
+
+def _breakdown(car_rows, buyer_rows, key_name: str):
+    """Объединить агрегаты автомобилей и покупателей по одному ключу"""
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for key, cars_count, total_value, average_price in car_rows:
+        groups[key] = {
+            key_name: key,
+            "cars_count": cars_count,
+            "total_car_value": total_value or 0,
+            "average_car_price": average_price or 0,
+            "buyers_count": 0,
+            "total_buying_power": 0,
+        }
+    for key, buyers_count, buying_power in buyer_rows:
+        group = groups.setdefault(key, {
+            key_name: key,
+            "cars_count": 0,
+            "total_car_value": 0,
+            "average_car_price": 0,
+        })
+        group["buyers_count"] = buyers_count
+        group["total_buying_power"] = buying_power or 0
+    return sorted(groups.values(), key=lambda group: (group[key_name] is None, group[key_name] or ""))
+
+
+async def compute_market_analysis(db: AsyncSession) -> Dict[str, Any]:
+    """Рассчитать анализ рынка агрегатными запросами"""
+    buyers_count, total_buying_power = (await db.execute(
+        select(func.count(Buyer.id), func.coalesce(func.sum(Buyer.max_price), 0))
+        .where(Buyer.max_price != None)
+    )).one()
+    cars_count, total_car_value = (await db.execute(
+        select(func.count(Car.id), func.coalesce(func.sum(Car.price), 0))
+    )).one()
+
+    cars_by_brand = (await db.execute(
+        select(Car.brand, func.count(Car.id), func.sum(Car.price), func.avg(Car.price))
+        .group_by(Car.brand)
+    )).all()
+    buyers_by_brand = (await db.execute(
+        select(Buyer.preferred_brand, func.count(Buyer.id), func.sum(Buyer.max_price))
+        .where(Buyer.max_price != None)
+        .group_by(Buyer.preferred_brand)
+    )).all()
+    cars_by_condition = (await db.execute(
+        select(Car.condition, func.count(Car.id), func.sum(Car.price), func.avg(Car.price))
+        .group_by(Car.condition)
+    )).all()
+    buyers_by_condition = (await db.execute(
+        select(Buyer.preferred_condition, func.count(Buyer.id), func.sum(Buyer.max_price))
+        .where(Buyer.max_price != None)
+        .group_by(Buyer.preferred_condition)
+    )).all()
+
+    return {
+        "total_buying_power": total_buying_power,
+        "total_car_value": total_car_value,
+        "ratio": total_buying_power / total_car_value if total_car_value > 0 else 0,
+        "average_buyer_budget": total_buying_power / buyers_count if buyers_count else 0,
+        "average_car_price": total_car_value / cars_count if cars_count else 0,
+        "buyers_count": buyers_count,
+        "cars_count": cars_count,
+        # Покупатели без предпочтения попадают в группу с ключом null
+        "by_brand": _breakdown(cars_by_brand, buyers_by_brand, "brand"),
+        "by_condition": _breakdown(cars_by_condition, buyers_by_condition, "condition"),
+    }
+
+
+async def refresh_market_snapshot(db: AsyncSession) -> MarketSnapshot:
+    """Пересчитать анализ рынка и сохранить снимок"""
+    data = await compute_market_analysis(db)
+    snapshot = await db.merge(MarketSnapshot(id=SNAPSHOT_ID, data=data, computed_at=datetime.utcnow()))
+    await db.commit()
+    return snapshot
+
+
+async def mark_market_snapshot_stale(db: AsyncSession):
+    """Удалить снимок в текущей транзакции (без commit)"""
+    await db.execute(delete(MarketSnapshot).where(MarketSnapshot.id == SNAPSHOT_ID))
+
+
+async def get_market_snapshot(db: AsyncSession) -> Optional[MarketSnapshot]:
+    """Последний снимок, если он не старше MARKET_SNAPSHOT_MAX_AGE_SECONDS"""
+    snapshot = await db.get(MarketSnapshot, SNAPSHOT_ID)
+    if snapshot is None:
+        return None
+    if datetime.utcnow() - snapshot.computed_at > timedelta(seconds=MARKET_SNAPSHOT_MAX_AGE_SECONDS):
+        return None
+    return snapshot
+
+
+async def run_market_snapshot_refresher(interval: float = MARKET_SNAPSHOT_REFRESH_SECONDS):
+    """Фоновая задача: периодически обновлять снимок анализа рынка"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await refresh_market_snapshot(db)
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении снимка анализа рынка: {str(e)}")
+        await asyncio.sleep(interval)
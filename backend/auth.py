@@ -1,12 +1,18 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from backend.schemas.database import get_db
 from backend.schemas import Buyer, Seller
+from backend.cache import TTLCache
 
 # Настройка через переменные окружения
 from os import environ
@@ -15,8 +21,21 @@ from os import environ
 SECRET_KEY = environ.get("SECRET_KEY", "your-secret-key-here")  # Переменная окружения или значение по умолчанию
 ALGORITHM = environ.get("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Кэш пользователей по (email, роль) и декодированных токенов (0 — отключить)
+AUTH_CACHE_TTL_SECONDS = float(environ.get("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(environ.get("AUTH_CACHE_SIZE", "10000"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+USER_ROLES = ["buyer", "seller", "admin"]
+
+_user_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+_token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+# Стоимость bcrypt; хеши с другой стоимостью пересчитываются при входе
+BCRYPT_ROUNDS = int(environ.get("BCRYPT_ROUNDS", "12"))
+# Число потоков для хеширования паролей (ограничивает параллельные вызовы bcrypt)
+PASSWORD_HASH_WORKERS = int(environ.get("PASSWORD_HASH_WORKERS", "4"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
@@ -31,6 +50,80 @@ def get_password_hash(password):
     """Генерация хеша пароля"""
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Проверка пароля; вторым значением — новый хеш, если текущий устарел"""
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except:
+        return False, None
+
+class PasswordHashMetrics:
+    """Счетчики пула хеширования: время ожидания в очереди и выполнения"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.queued = 0
+        self.running = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.run_time_total = 0.0
+
+    def submitted(self):
+        with self._lock:
+            self.queued += 1
+
+    def started(self, queue_time: float):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.queue_time_total += queue_time
+            self.queue_time_max = max(self.queue_time_max, queue_time)
+
+    def finished(self, run_time: float):
+        with self._lock:
+            self.running -= 1
+            self.calls += 1
+            self.run_time_total += run_time
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": PASSWORD_HASH_WORKERS,
+                "calls": self.calls,
+                "queued": self.queued,
+                "running": self.running,
+                "avg_queue_time_ms": self.queue_time_total / self.calls * 1000 if self.calls else 0,
+                "max_queue_time_ms": self.queue_time_max * 1000,
+                "avg_run_time_ms": self.run_time_total / self.calls * 1000 if self.calls else 0,
+            }
+
+password_hash_metrics = PasswordHashMetrics()
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+async def _run_in_password_pool(func, *args):
+    """Выполнить bcrypt в пуле потоков, не блокируя цикл событий"""
+    submitted_at = time.perf_counter()
+
+    def task():
+        started_at = time.perf_counter()
+        password_hash_metrics.started(started_at - submitted_at)
+        try:
+            return func(*args)
+        finally:
+            password_hash_metrics.finished(time.perf_counter() - started_at)
+
+    password_hash_metrics.submitted()
+    return await asyncio.get_running_loop().run_in_executor(_password_executor, task)
+
+async def get_password_hash_async(password):
+    """Генерация хеша пароля в пуле потоков"""
+    return await _run_in_password_pool(get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Проверка пароля (и пересчет устаревшего хеша) в пуле потоков"""
+    return await _run_in_password_pool(verify_and_update_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Создание JWT токена доступа"""
     to_encode = data.copy()
@@ -42,7 +135,56 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_token(token: str) -> dict:
+    """Декодирование JWT с кэшированием результата для повторяющихся токенов"""
+    payload = _token_cache.get(token)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            return payload
+        _token_cache.delete(token)
+        raise JWTError("Signature has expired.")
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    # Декодированный токен хранится в кэше не дольше срока его действия
+    if "exp" in payload:
+        _token_cache.set(token, payload, ttl=payload["exp"] - time.time())
+    return payload
+
+async def load_user(db: AsyncSession, email: str, role: str):
+    """Поиск пользователя по email и роли с кэшированием в памяти процесса"""
+    key = (email, role)
+    user = _user_cache.get(key)
+    if user is not None:
+        return user
+
+    if role == "buyer":
+        user = await db.scalar(select(Buyer).where(Buyer.email == email))
+    elif role in ["seller", "admin"]:
+        user = await db.scalar(select(Seller).where(Seller.email == email))
+    else:
+        return None
+
+    if user is None:
+        return None
+
+    # Добавление роли к объекту пользователя. Объект отсоединяется от сессии,
+    # чтобы его можно было безопасно переиспользовать в других запросах
+    user.role = role
+    db.expunge(user)
+    _user_cache.set(key, user)
+    return user
+
+def invalidate_user(email: str):
+    """Сброс кэша пользователя (изменение профиля, пароля, удаление)"""
+    for role in USER_ROLES:
+        _user_cache.delete((email, role))
+
+def clear_auth_caches():
+    """Полная очистка кэшей аутентификации"""
+    _user_cache.clear()
+    _token_cache.clear()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """Получение текущего пользователя из JWT токена"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -50,7 +192,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         role: str = payload.get("role")
         if email is None:
@@ -58,27 +200,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
 
-    # Поиск пользователя по email и роли
-    if role == "buyer":
-        user = db.query(Buyer).filter(Buyer.email == email).first()
-    elif role in ["seller", "admin"]:
-        user = db.query(Seller).filter(Seller.email == email).first()
-    else:
-        raise credentials_exception
-
+    user = await load_user(db, email, role)
     if user is None:
         raise credentials_exception
-
-    # Добавление роли к объекту пользователя
-    user.role = role
     return user
 
-async def get_current_user_optional(token: str = Depends(oauth2_scheme_optional), db: Session = Depends(get_db)):
+async def get_current_user_optional(token: str = Depends(oauth2_scheme_optional), db: AsyncSession = Depends(get_db)):
     """Получение текущего пользователя, если токен предоставлен"""
     if not token:
         return None
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         role: str = payload.get("role")
         if email is None:
@@ -86,20 +218,11 @@ async def get_current_user_optional(token: str = Depends(oauth2_scheme_optional)
     except JWTError:
         return None
 
-    if role == "buyer":
-        user = db.query(Buyer).filter(Buyer.email == email).first()
-    elif role in ["seller", "admin"]:
-        user = db.query(Seller).filter(Seller.email == email).first()
-    else:
-        return None
-
-    if user:
-        user.role = role
-    return user
+    return await load_user(db, email, role)
 
 async def get_current_buyer(current_user = Depends(get_current_user)):
     """Проверка, что текущий пользователь - покупатель"""
-    if not hasattr(current_user, 'favorites'):  # У покупателей есть избранное
+    if not isinstance(current_user, Buyer):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Доступ ограничен только для покупателей"
@@ -108,7 +231,7 @@ async def get_current_buyer(current_user = Depends(get_current_user)):
 
 async def get_current_seller(current_user = Depends(get_current_user)):
     """Проверка, что текущий пользователь - продавец или админ"""
-    if not hasattr(current_user, 'cars'):  # У продавцов есть машины
+    if not isinstance(current_user, Seller):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Доступ ограничен только для продавцов/админов"
@@ -0,0 +1,134 @@
+"""
+Жизненный цикл сделки.
+
+Допустимые переходы статусов:
+
+    pending  -> approved | rejected
+    approved -> completed | rejected
+
+rejected и completed — конечные статусы. Проверка владельца автомобиля,
+текущего статуса и само изменение выполняются одним
+UPDATE deals ... FROM cars ... RETURNING. Завершение сделки в той же
+транзакции помечает автомобиль проданным и отклоняет остальные активные
+заявки на него; строка автомобиля блокируется (SELECT ... FOR UPDATE),
+чтобы две сделки по одному автомобилю не могли завершиться одновременно.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.schemas import Car, Deal, DEAL_STATUSES
+from backend.read_model import refresh_car_listings
+from backend.outbox import publish_event, publish_events
+
+DEAL_TRANSITIONS: Dict[str, FrozenSet[str]] = {
+    "pending": frozenset({"approved", "rejected"}),
+    "approved": frozenset({"completed", "rejected"}),
+    "rejected": frozenset(),
+    "completed": frozenset(),
+}
+
+# Заявки, которые еще могут привести к продаже автомобиля
+ACTIVE_DEAL_STATUSES = ["pending", "approved"]
+
+
+@dataclass
+class DealTransition:
+    """Результат смены статуса сделки"""
+    deal_id: int
+    car_id: int
+    status: str
+    rejected_deal_ids: List[int] = field(default_factory=list)
+
+    @property
+    def car_sold(self) -> bool:
+        return self.status == "completed"
+
+
+def source_statuses(status: str) -> List[str]:
+    """Статусы, из которых допустим переход в status"""
+    return [source for source, targets in DEAL_TRANSITIONS.items() if status in targets]
+
+
+async def transition_deal(db: AsyncSession, deal_id: int, seller_id: int, status: str) -> DealTransition:
+    """Перевести сделку продавца в новый статус (без commit)"""
+    if status not in DEAL_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Недопустимый статус. Допустимые значения: {DEAL_STATUSES}")
+
+    if status == "completed":
+        # Завершения сделок по одному автомобилю выполняются по очереди
+        await db.execute(
+            select(Car.id)
+            .join(Deal, Deal.car_id == Car.id)
+            .where(Deal.id == deal_id, Car.seller_id == seller_id)
+            .with_for_update(of=Car)
+        )
+
+    conditions = [
+        Deal.id == deal_id,
+        Deal.car_id == Car.id,
+        Car.seller_id == seller_id,
+        Deal.status.in_(source_statuses(status)),
+    ]
+    if status != "rejected":
+        conditions.append(Car.status != "sold")
+
+    row = (await db.execute(
+        update(Deal)
+        .where(*conditions)
+        .values(status=status)
+        .returning(Deal.id, Deal.car_id)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is None:
+        await _raise_rejected_transition(db, deal_id, seller_id, status)
+
+    transition = DealTransition(deal_id=row.id, car_id=row.car_id, status=status)
+    await publish_event(db, "deal.status_changed", transition.deal_id, {"car_id": transition.car_id, "status": status})
+    if transition.car_sold:
+        await db.execute(
+            update(Car)
+            .where(Car.id == transition.car_id)
+            .values(status="sold")
+            .execution_options(synchronize_session=False)
+        )
+        transition.rejected_deal_ids = list((await db.scalars(
+            update(Deal)
+            .where(
+                Deal.car_id == transition.car_id,
+                Deal.id != transition.deal_id,
+                Deal.status.in_(ACTIVE_DEAL_STATUSES),
+            )
+            .values(status="rejected")
+            .returning(Deal.id)
+            .execution_options(synchronize_session=False)
+        )).all())
+        await refresh_car_listings(db, [transition.car_id])
+        await publish_event(db, "car.status_changed", transition.car_id, {"status": "sold"})
+        await publish_events(
+            db, "deal.status_changed", transition.rejected_deal_ids,
+            {"car_id": transition.car_id, "status": "rejected"}
+        )
+    return transition
+
+
+async def _raise_rejected_transition(db: AsyncSession, deal_id: int, seller_id: int, status: str):
+    """Объяснить, почему UPDATE не затронул сделку"""
+    current = (await db.execute(
+        select(Deal.status, Car.seller_id, Car.status.label("car_status"))
+        .join(Car, Car.id == Deal.car_id)
+        .where(Deal.id == deal_id)
+    )).first()
+    if current is None:
+        raise HTTPException(status_code=404, detail="Сделка не найдена")
+    if current.seller_id != seller_id:
+        raise HTTPException(status_code=403, detail="У вас нет прав на обновление этой сделки")
+    if current.car_status == "sold" and status != "rejected":
+        raise HTTPException(status_code=409, detail="Автомобиль уже продан")
+    raise HTTPException(
+        status_code=409,
+        detail=f"Недопустимый переход статуса: {current.status} -> {status}"
+    )
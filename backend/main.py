@@ -1,18 +1,40 @@
 from fastapi import FastAPI, Depends
+from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 
 # Импорт схем и моделей
-from backend.schemas.database import engine
+from backend.schemas.database import engine, pool_status
 from backend.schemas.base import Base
 
 # Импорт роутеров
-from backend.routers import auth, cars, users, favorites, deals, stores, queries
+from backend.routers import auth, cars, users, favorites, deals, stores, queries, notifications
+from backend.auth import password_hash_metrics
+from backend.analytics import run_market_snapshot_refresher, MARKET_SNAPSHOT_REFRESH_SECONDS
+from backend.outbox import outbox_dispatcher
+from backend.alerts import notify_matching_buyers
 
 # Создание всех таблиц при запуске приложения
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Car Dealership API")
+# Потребители событий outbox
+outbox_dispatcher.subscribe(notify_matching_buyers, event_types=["car.created"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка фоновых задач приложения"""
+    tasks = []
+    if MARKET_SNAPSHOT_REFRESH_SECONDS > 0:
+        tasks.append(asyncio.create_task(run_market_snapshot_refresher()))
+    if outbox_dispatcher.interval > 0:
+        tasks.append(asyncio.create_task(outbox_dispatcher.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+app = FastAPI(title="Car Dealership API", lifespan=lifespan)
 
 # Настройка CORS
 app.add_middleware(
@@ -34,6 +56,7 @@ app.include_router(favorites.router, prefix="/favorites", tags=["favorites"])
 app.include_router(deals.router, prefix="/deals", tags=["deals"])
 app.include_router(stores.router, prefix="/stores", tags=["stores"])
 app.include_router(queries.router, prefix="/queries", tags=["queries"])
+app.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
 
 # Подключаем специальный маршрут для получения автомобилей продавца
 @app.get("/seller/cars", tags=["seller"])
@@ -46,5 +69,14 @@ async def health_check():
     """Проверка работоспособности API"""
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/metrics")
+async def metrics():
+    """Метрики пулов приложения"""
+    return {
+        "password_hashing": password_hash_metrics.snapshot(),
+        "database_pool": pool_status(),
+        "outbox": outbox_dispatcher.metrics.snapshot()
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,247 @@
+"""
+Сопоставление покупателей и автомобилей по сохраненным предпочтениям.
+
+Предпочтения покупателей хранятся в памяти процесса в виде индекса:
+для каждого поля на равенство (марка, модель, коробка, состояние) —
+корзины «значение -> множество покупателей» и отдельная корзина
+покупателей без предпочтения. Для автомобиля берется самая маленькая
+из подходящих корзин, и только ее покупатели проверяются по диапазонам
+(год, мощность, цена) — без полного перебора таблицы buyers.
+
+Индекс обновляется инкрементально при регистрации, изменении и удалении
+покупателя и полностью перестраивается раз в MATCHING_INDEX_TTL_SECONDS,
+чтобы подхватить изменения, сделанные другими процессами.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from os import environ
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.schemas import Buyer, Car
+
+MATCHING_INDEX_TTL_SECONDS = float(environ.get("MATCHING_INDEX_TTL_SECONDS", "300"))
+
+# Поля на равенство: атрибут предпочтений -> атрибут автомобиля
+EQUALITY_FIELDS = ("brand", "model", "transmission", "condition")
+
+
+@dataclass(slots=True)
+class CarSpec:
+    """Параметры автомобиля, по которым ищутся покупатели (None — не учитывать)"""
+    id: Optional[int] = None
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    year: Optional[int] = None
+    power: Optional[int] = None
+    transmission: Optional[str] = None
+    condition: Optional[str] = None
+    price: Optional[float] = None
+
+    @classmethod
+    def from_car(cls, car) -> "CarSpec":
+        return cls(
+            id=car.id,
+            brand=car.brand,
+            model=car.model,
+            year=car.year,
+            power=car.power,
+            transmission=car.transmission,
+            condition=car.condition,
+            price=car.price,
+        )
+
+
+@dataclass(slots=True)
+class BuyerPreferences:
+    """Сохраненные предпочтения покупателя (None — любое значение)"""
+    buyer_id: int
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    min_year: Optional[int] = None
+    max_year: Optional[int] = None
+    min_power: Optional[int] = None
+    max_power: Optional[int] = None
+    transmission: Optional[str] = None
+    condition: Optional[str] = None
+    max_price: Optional[float] = None
+
+    @classmethod
+    def from_buyer(cls, buyer) -> "BuyerPreferences":
+        return cls(
+            buyer_id=buyer.id,
+            brand=buyer.preferred_brand or None,
+            model=buyer.preferred_model or None,
+            min_year=buyer.min_year,
+            max_year=buyer.max_year,
+            min_power=buyer.min_power,
+            max_power=buyer.max_power,
+            transmission=buyer.preferred_transmission or None,
+            condition=buyer.preferred_condition or None,
+            max_price=buyer.max_price,
+        )
+
+    @property
+    def has_criteria(self) -> bool:
+        """Задан ли хотя бы один критерий (без критериев подходит любой автомобиль)"""
+        return any(getattr(self, f.name) is not None for f in fields(self) if f.name != "buyer_id")
+
+    def accepts(self, car: CarSpec) -> bool:
+        """Подходит ли автомобиль под предпочтения"""
+        for field in EQUALITY_FIELDS:
+            wanted = getattr(self, field)
+            actual = getattr(car, field)
+            if wanted is not None and actual is not None and wanted != actual:
+                return False
+        if car.year is not None:
+            if self.min_year is not None and car.year < self.min_year:
+                return False
+            if self.max_year is not None and car.year > self.max_year:
+                return False
+        if car.power is not None:
+            if self.min_power is not None and car.power < self.min_power:
+                return False
+            if self.max_power is not None and car.power > self.max_power:
+                return False
+        if car.price is not None and self.max_price is not None and car.price > self.max_price:
+            return False
+        return True
+
+    def car_conditions(self, source=Car) -> list:
+        """Условия SQL для обратного поиска: автомобили под эти предпочтения
+
+        source — Car или денормализованная проекция CarListing.
+        """
+        conditions = []
+        if self.brand:
+            conditions.append(source.brand == self.brand)
+        if self.model:
+            conditions.append(source.model == self.model)
+        if self.min_year is not None:
+            conditions.append(source.year >= self.min_year)
+        if self.max_year is not None:
+            conditions.append(source.year <= self.max_year)
+        if self.min_power is not None:
+            conditions.append(source.power >= self.min_power)
+        if self.max_power is not None:
+            conditions.append(source.power <= self.max_power)
+        if self.transmission:
+            conditions.append(source.transmission == self.transmission)
+        if self.condition:
+            conditions.append(source.condition == self.condition)
+        if self.max_price is not None:
+            conditions.append(source.price <= self.max_price)
+        return conditions
+
+
+class BuyerMatcher:
+    """Индекс предпочтений покупателей в памяти процесса"""
+
+    def __init__(self, ttl: float = MATCHING_INDEX_TTL_SECONDS):
+        self.ttl = ttl
+        self.reset()
+
+    def reset(self):
+        """Очистить индекс; он будет загружен заново при следующем обращении"""
+        self._preferences: Dict[int, BuyerPreferences] = {}
+        self._buckets: Dict[str, Dict[Optional[str], Set[int]]] = {
+            field: defaultdict(set) for field in EQUALITY_FIELDS
+        }
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self._preferences)
+
+    def upsert(self, preferences: BuyerPreferences):
+        """Добавить или обновить предпочтения покупателя"""
+        self.remove(preferences.buyer_id)
+        self._preferences[preferences.buyer_id] = preferences
+        for field in EQUALITY_FIELDS:
+            self._buckets[field][getattr(preferences, field)].add(preferences.buyer_id)
+
+    def remove(self, buyer_id: int):
+        """Удалить покупателя из индекса"""
+        preferences = self._preferences.pop(buyer_id, None)
+        if preferences is None:
+            return
+        for field in EQUALITY_FIELDS:
+            key = getattr(preferences, field)
+            bucket = self._buckets[field].get(key)
+            if bucket is not None:
+                bucket.discard(buyer_id)
+                if not bucket:
+                    del self._buckets[field][key]
+
+    def buyer_updated(self, buyer):
+        """Инкрементально обновить индекс после изменения покупателя"""
+        if self.loaded:
+            self.upsert(BuyerPreferences.from_buyer(buyer))
+
+    def buyer_deleted(self, buyer_id: int):
+        """Инкрементально обновить индекс после удаления покупателя"""
+        if self.loaded:
+            self.remove(buyer_id)
+
+    def _candidates(self, car: CarSpec) -> Iterable[int]:
+        """Покупатели из самой узкой подходящей корзины"""
+        best: Optional[List[Set[int]]] = None
+        best_size = None
+        for field in EQUALITY_FIELDS:
+            value = getattr(car, field)
+            if value is None:
+                continue
+            buckets = self._buckets[field]
+            sets = [buckets.get(value, set()), buckets.get(None, set())]
+            size = sum(len(s) for s in sets)
+            if best_size is None or size < best_size:
+                best, best_size = sets, size
+        if best is None:
+            return self._preferences.keys()
+        return (buyer_id for s in best for buyer_id in s)
+
+    def match(self, car: CarSpec, with_criteria_only: bool = False) -> List[int]:
+        """Id покупателей, которым подходит автомобиль
+
+        with_criteria_only=True пропускает покупателей без единого критерия.
+        """
+        preferences = self._preferences
+        return sorted(
+            buyer_id for buyer_id in self._candidates(car)
+            if (not with_criteria_only or preferences[buyer_id].has_criteria)
+            and preferences[buyer_id].accepts(car)
+        )
+
+    def match_many(self, cars: Iterable[CarSpec], with_criteria_only: bool = False) -> Dict[int, List[int]]:
+        """Пакетное сопоставление: id автомобиля -> id подходящих покупателей"""
+        return {car.id: self.match(car, with_criteria_only) for car in cars}
+
+    async def ensure_loaded(self, db: AsyncSession):
+        """Загрузить индекс из БД, если он пуст или устарел"""
+        if self.loaded and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        async with self._lock:
+            if self.loaded and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            rows = await db.execute(select(
+                Buyer.id, Buyer.preferred_brand, Buyer.preferred_model,
+                Buyer.min_year, Buyer.max_year, Buyer.min_power, Buyer.max_power,
+                Buyer.preferred_transmission, Buyer.preferred_condition, Buyer.max_price,
+            ))
+            self._preferences = {}
+            self._buckets = {field: defaultdict(set) for field in EQUALITY_FIELDS}
+            for row in rows:
+                self.upsert(BuyerPreferences.from_buyer(row))
+            self._loaded_at = time.monotonic()
+
+
+# Индекс процесса, используемый роутерами
+buyer_matcher = BuyerMatcher()
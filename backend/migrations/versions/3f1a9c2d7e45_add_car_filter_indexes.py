@@ -0,0 +1,55 @@
+"""add_car_filter_indexes
+
+Revision ID: 3f1a9c2d7e45
+Revises: 488536959ea1
+Create Date: 2026-10-18 10:12:04.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a9c2d7e45'
+down_revision: Union[str, None] = '488536959ea1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Триграммные индексы для поиска подстроки по бренду и модели (ILIKE '%...%')
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_cars_brand_trgm', 'cars', ['brand'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'brand': 'gin_trgm_ops'})
+    op.create_index('ix_cars_model_trgm', 'cars', ['model'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'model': 'gin_trgm_ops'})
+
+    # Диапазонные фильтры и keyset-пагинация
+    op.create_index('ix_cars_price_id', 'cars', ['price', 'id'], unique=False)
+    op.create_index('ix_cars_year_id', 'cars', ['year', 'id'], unique=False)
+    op.create_index('ix_cars_mileage', 'cars', ['mileage'], unique=False)
+
+    # Фильтры на равенство
+    op.create_index('ix_cars_condition_transmission_price', 'cars',
+                    ['condition', 'transmission', 'price'], unique=False)
+    op.create_index('ix_cars_status', 'cars', ['status'], unique=False)
+
+    # Внешние ключи
+    op.create_index(op.f('ix_cars_seller_id'), 'cars', ['seller_id'], unique=False)
+    op.create_index(op.f('ix_cars_store_id'), 'cars', ['store_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cars_store_id'), table_name='cars')
+    op.drop_index(op.f('ix_cars_seller_id'), table_name='cars')
+    op.drop_index('ix_cars_status', table_name='cars')
+    op.drop_index('ix_cars_condition_transmission_price', table_name='cars')
+    op.drop_index('ix_cars_mileage', table_name='cars')
+    op.drop_index('ix_cars_year_id', table_name='cars')
+    op.drop_index('ix_cars_price_id', table_name='cars')
+    op.drop_index('ix_cars_model_trgm', table_name='cars')
+    op.drop_index('ix_cars_brand_trgm', table_name='cars')
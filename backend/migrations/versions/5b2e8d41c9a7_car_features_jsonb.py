@@ -0,0 +1,56 @@
+"""car_features_jsonb
+
+Revision ID: 5b2e8d41c9a7
+Revises: 3f1a9c2d7e45
+Create Date: 2026-10-18 11:40:27.503916
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8d41c9a7'
+down_revision: Union[str, None] = '3f1a9c2d7e45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # features хранился как JSON-строка в Text; пустые строки превращаются в NULL.
+    # Старые строки с текстом, не являющимся JSON, приложение отдавало как есть —
+    # такие значения оборачиваются в массив из одного элемента вместо ошибки миграции
+    op.execute("""
+        CREATE FUNCTION car_features_to_jsonb(value text) RETURNS jsonb AS $$
+        BEGIN
+            IF value IS NULL OR value = '' THEN
+                RETURN NULL;
+            END IF;
+            RETURN value::jsonb;
+        EXCEPTION WHEN invalid_text_representation THEN
+            RETURN jsonb_build_array(value);
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    op.alter_column('cars', 'features',
+                    existing_type=sa.Text(),
+                    type_=postgresql.JSONB(),
+                    existing_nullable=True,
+                    postgresql_using="car_features_to_jsonb(features)")
+    op.execute("DROP FUNCTION car_features_to_jsonb(text)")
+    op.create_index('ix_cars_features', 'cars', ['features'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'features': 'jsonb_path_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cars_features', table_name='cars')
+    op.alter_column('cars', 'features',
+                    existing_type=postgresql.JSONB(),
+                    type_=sa.Text(),
+                    existing_nullable=True,
+                    postgresql_using='features::text')
@@ -0,0 +1,84 @@
+"""add_car_listings
+
+Revision ID: 9e3b6a2f5d14
+Revises: 7c4d1f0a2b68
+Create Date: 2026-10-18 16:41:27.503918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e3b6a2f5d14'
+down_revision: Union[str, None] = '7c4d1f0a2b68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('car_listings',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('brand', sa.String(), nullable=True),
+    sa.Column('model', sa.String(), nullable=True),
+    sa.Column('year', sa.Integer(), nullable=True),
+    sa.Column('power', sa.Integer(), nullable=True),
+    sa.Column('transmission', sa.String(), nullable=True),
+    sa.Column('condition', sa.String(), nullable=True),
+    sa.Column('mileage', sa.Float(), nullable=True),
+    sa.Column('features', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('seller_id', sa.Integer(), nullable=True),
+    sa.Column('seller_name', sa.String(), nullable=True),
+    sa.Column('store_id', sa.Integer(), nullable=True),
+    sa.Column('store_name', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Те же индексы, что и у cars, для фильтров и сортировок каталога
+    op.create_index('ix_car_listings_brand_trgm', 'car_listings', ['brand'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'brand': 'gin_trgm_ops'})
+    op.create_index('ix_car_listings_model_trgm', 'car_listings', ['model'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'model': 'gin_trgm_ops'})
+    op.create_index('ix_car_listings_price_id', 'car_listings', ['price', 'id'], unique=False)
+    op.create_index('ix_car_listings_year_id', 'car_listings', ['year', 'id'], unique=False)
+    op.create_index('ix_car_listings_mileage', 'car_listings', ['mileage'], unique=False)
+    op.create_index('ix_car_listings_condition_transmission_price', 'car_listings',
+                    ['condition', 'transmission', 'price'], unique=False)
+    op.create_index('ix_car_listings_status', 'car_listings', ['status'], unique=False)
+    op.create_index('ix_car_listings_features', 'car_listings', ['features'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'features': 'jsonb_path_ops'})
+    op.create_index(op.f('ix_car_listings_seller_id'), 'car_listings', ['seller_id'], unique=False)
+    op.create_index(op.f('ix_car_listings_store_id'), 'car_listings', ['store_id'], unique=False)
+
+    # Первоначальное заполнение проекции из существующих данных
+    op.execute("""
+        INSERT INTO car_listings (id, brand, model, year, power, transmission, condition, mileage,
+                                  features, price, status, seller_id, seller_name, store_id, store_name)
+        SELECT cars.id, cars.brand, cars.model, cars.year, cars.power, cars.transmission, cars.condition,
+               cars.mileage, cars.features, cars.price, cars.status,
+               cars.seller_id, sellers.full_name, cars.store_id, stores.name
+        FROM cars
+        LEFT OUTER JOIN sellers ON sellers.id = cars.seller_id
+        LEFT OUTER JOIN stores ON stores.id = cars.store_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_car_listings_store_id'), table_name='car_listings')
+    op.drop_index(op.f('ix_car_listings_seller_id'), table_name='car_listings')
+    op.drop_index('ix_car_listings_features', table_name='car_listings')
+    op.drop_index('ix_car_listings_status', table_name='car_listings')
+    op.drop_index('ix_car_listings_condition_transmission_price', table_name='car_listings')
+    op.drop_index('ix_car_listings_mileage', table_name='car_listings')
+    op.drop_index('ix_car_listings_year_id', table_name='car_listings')
+    op.drop_index('ix_car_listings_price_id', table_name='car_listings')
+    op.drop_index('ix_car_listings_model_trgm', table_name='car_listings')
+    op.drop_index('ix_car_listings_brand_trgm', table_name='car_listings')
+    op.drop_table('car_listings')
@@ -0,0 +1,38 @@
+"""add_car_search_vector
+
+Revision ID: b4f7e2c9a1d3
+Revises: 9e3b6a2f5d14
+Create Date: 2026-10-18 17:22:48.915306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f7e2c9a1d3'
+down_revision: Union[str, None] = '9e3b6a2f5d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Генерируемая колонка для полнотекстового поиска по марке, модели и опциям
+    op.execute("""
+        ALTER TABLE cars ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(brand, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(model, '')), 'A') ||
+            setweight(jsonb_to_tsvector('simple', coalesce(features, '[]'::jsonb), '["string"]'), 'B')
+        ) STORED
+    """)
+    op.create_index('ix_cars_search_vector', 'cars', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cars_search_vector', table_name='cars')
+    op.drop_column('cars', 'search_vector')
@@ -0,0 +1,37 @@
+"""favorites_unique_buyer_car
+
+Revision ID: c8a3d5e1f702
+Revises: b4f7e2c9a1d3
+Create Date: 2026-10-18 18:03:12.640187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8a3d5e1f702'
+down_revision: Union[str, None] = 'b4f7e2c9a1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Удаляем дубликаты, накопившиеся из-за гонки «проверить, затем вставить»
+    op.execute("""
+        DELETE FROM favorites
+        WHERE id NOT IN (
+            SELECT min(id) FROM favorites GROUP BY buyer_id, car_id
+        )
+    """)
+    op.create_unique_constraint('uq_favorites_buyer_car', 'favorites', ['buyer_id', 'car_id'])
+    op.create_index(op.f('ix_favorites_car_id'), 'favorites', ['car_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_favorites_car_id'), table_name='favorites')
+    op.drop_constraint('uq_favorites_buyer_car', 'favorites', type_='unique')
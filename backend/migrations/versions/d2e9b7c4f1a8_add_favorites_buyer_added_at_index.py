@@ -0,0 +1,29 @@
+"""add_favorites_buyer_added_at_index
+
+Revision ID: d2e9b7c4f1a8
+Revises: c8a3d5e1f702
+Create Date: 2026-10-18 18:37:55.201463
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2e9b7c4f1a8'
+down_revision: Union[str, None] = 'c8a3d5e1f702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset-пагинация избранного покупателя по дате добавления
+    op.create_index('ix_favorites_buyer_added_at', 'favorites', ['buyer_id', 'added_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_favorites_buyer_added_at', table_name='favorites')
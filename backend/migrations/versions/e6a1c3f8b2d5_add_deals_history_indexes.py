@@ -0,0 +1,31 @@
+"""add_deals_history_indexes
+
+Revision ID: e6a1c3f8b2d5
+Revises: d2e9b7c4f1a8
+Create Date: 2026-10-18 19:12:08.604317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a1c3f8b2d5'
+down_revision: Union[str, None] = 'd2e9b7c4f1a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # История сделок (GET /deals/my) с keyset-пагинацией по дате сделки
+    op.create_index('ix_deals_buyer_date', 'deals', ['buyer_id', 'deal_date', 'id'], unique=False)
+    op.create_index('ix_deals_car_date', 'deals', ['car_id', 'deal_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_deals_car_date', table_name='deals')
+    op.drop_index('ix_deals_buyer_date', table_name='deals')
@@ -0,0 +1,37 @@
+"""add_deals_pending_unique_index
+
+Revision ID: f3b8d6a2c4e9
+Revises: e6a1c3f8b2d5
+Create Date: 2026-10-18 19:48:31.275940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d6a2c4e9'
+down_revision: Union[str, None] = 'e6a1c3f8b2d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Дубли ожидающих заявок, созданные до появления индекса: остается самая ранняя
+    op.execute(
+        "UPDATE deals SET status = 'rejected' "
+        "WHERE status = 'pending' AND id NOT IN ("
+        "SELECT min(id) FROM deals WHERE status = 'pending' GROUP BY car_id, buyer_id)"
+    )
+    op.create_index(
+        'uq_deals_pending_car_buyer', 'deals', ['car_id', 'buyer_id'],
+        unique=True, postgresql_where=sa.text("status = 'pending'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_deals_pending_car_buyer', table_name='deals')
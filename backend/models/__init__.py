@@ -2,7 +2,7 @@ from .base import UserRole, Transmission, Condition, DealStatus
 from .user import UserBase, UserCreate, UserInDB, User
 from .buyer import BuyerBase, BuyerCreate, BuyerInDB, Buyer, BuyerUpdate
 from .seller import SellerBase, SellerCreate, SellerInDB, Seller, SellerUpdate
-from .car import CarBase, CarCreate, CarInDB, Car, CarStatusUpdate
+from .car import CarBase, CarCreate, CarInDB, Car, CarStatusUpdate, CarBulkStatusUpdate, CarBulkDelete
 from .store import StoreBase, StoreCreate, StoreInDB, Store
 from .favorite import FavoriteBase, FavoriteCreate, FavoriteInDB, Favorite
 from .deal import DealBase, DealCreate, DealInDB, Deal
@@ -12,7 +12,7 @@ __all__ = [
     "UserBase", "UserCreate", "UserInDB", "User",
     "BuyerBase", "BuyerCreate", "BuyerInDB", "Buyer", "BuyerUpdate",
     "SellerBase", "SellerCreate", "SellerInDB", "Seller", "SellerUpdate",
-    "CarBase", "CarCreate", "CarInDB", "Car", "CarStatusUpdate",
+    "CarBase", "CarCreate", "CarInDB", "Car", "CarStatusUpdate", "CarBulkStatusUpdate", "CarBulkDelete",
     "StoreBase", "StoreCreate", "StoreInDB", "Store",
     "FavoriteBase", "FavoriteCreate", "FavoriteInDB", "Favorite",
     "DealBase", "DealCreate", "DealInDB", "Deal"
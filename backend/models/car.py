@@ -44,3 +44,12 @@ class Car(CarBase):
 class CarStatusUpdate(BaseModel):
     """Модель для обновления статуса автомобиля"""
     status: str
+
+class CarBulkStatusUpdate(BaseModel):
+    """Модель для массового обновления статуса автомобилей"""
+    car_ids: List[int]
+    status: str
+
+class CarBulkDelete(BaseModel):
+    """Модель для массового удаления автомобилей"""
+    car_ids: List[int]
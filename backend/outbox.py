@@ -0,0 +1,222 @@
+"""
+Транзакционный outbox доменных событий.
+
+Обработчики, меняющие автомобили, сделки и избранное, записывают события
+в таблицу outbox_events той же транзакцией (publish_events), поэтому событие
+появляется тогда и только тогда, когда изменение зафиксировано. Фоновый
+диспетчер, запускаемый в lifespan приложения, пачками читает неотправленные
+события и передает их подписанным потребителям; отметка processed_at
+ставится в той же транзакции, что и работа потребителей с БД.
+
+Доставка — «хотя бы один раз»: при ошибке любого потребителя пачка
+откатывается и повторяется по одному событию, поэтому потребители должны
+быть идемпотентны. Попытка засчитывается только событию, на котором
+ошибка повторилась; событие, не обработанное за OUTBOX_MAX_ATTEMPTS
+попыток, больше не выбирается и остается в таблице с текстом последней
+ошибки.
+
+Типы событий: car.created, car.updated, car.status_changed, car.deleted,
+deal.created, deal.status_changed, deal.deleted, favorite.added,
+favorite.removed.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from os import environ
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.schemas import OutboxEvent
+from backend.schemas.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Пауза между опросами outbox в секундах (0 — диспетчер не запускается)
+OUTBOX_DISPATCH_INTERVAL_SECONDS = float(environ.get("OUTBOX_DISPATCH_INTERVAL_SECONDS", "1"))
+OUTBOX_BATCH_SIZE = int(environ.get("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_ATTEMPTS = int(environ.get("OUTBOX_MAX_ATTEMPTS", "10"))
+
+# Потребитель получает сессию транзакции диспетчера и пачку событий
+Consumer = Callable[[AsyncSession, List[OutboxEvent]], Awaitable[None]]
+
+
+async def publish_events(
+    db: AsyncSession,
+    event_type: str,
+    aggregate_ids: Iterable[int],
+    payload: Optional[Dict[str, Any]] = None,
+):
+    """Записать события в outbox в текущей транзакции (без commit)"""
+    created_at = datetime.utcnow()
+    rows = [
+        {"event_type": event_type, "aggregate_id": aggregate_id, "payload": payload or {}, "created_at": created_at}
+        for aggregate_id in aggregate_ids
+    ]
+    if rows:
+        await db.execute(insert(OutboxEvent), rows)
+
+
+async def publish_event(db: AsyncSession, event_type: str, aggregate_id: int, payload: Optional[Dict[str, Any]] = None):
+    """Записать одно событие в outbox в текущей транзакции (без commit)"""
+    await publish_events(db, event_type, [aggregate_id], payload)
+
+
+class DispatcherMetrics:
+    """Счетчики доставки и задержка событий"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.dispatched = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.failed_events = 0
+        self.lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.last_error = None
+
+    def record_lag(self, lag_seconds: float):
+        self.lag_seconds = lag_seconds
+        self.max_lag_seconds = max(self.max_lag_seconds, lag_seconds)
+
+    def record_batch(self, size: int):
+        self.batches += 1
+        self.dispatched += size
+
+    def record_failure(self, error: str):
+        self.failed_batches += 1
+        self.last_error = error
+
+    def record_event_failure(self, error: str):
+        self.failed_events += 1
+        self.last_error = error
+
+    def snapshot(self) -> dict:
+        return {
+            "dispatched": self.dispatched,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "failed_events": self.failed_events,
+            # Возраст самого старого события в последней выбранной пачке
+            "lag_ms": self.lag_seconds * 1000,
+            "max_lag_ms": self.max_lag_seconds * 1000,
+            "last_error": self.last_error,
+        }
+
+
+class OutboxDispatcher:
+    """Доставка событий outbox подписанным потребителям"""
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        interval: float = OUTBOX_DISPATCH_INTERVAL_SECONDS,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.metrics = DispatcherMetrics()
+        self._consumers: List[Tuple[Optional[frozenset], Consumer]] = []
+
+    def subscribe(self, consumer: Consumer, event_types: Optional[Iterable[str]] = None) -> Consumer:
+        """Подписать потребителя на события заданных типов (None — на все)"""
+        self._consumers.append((frozenset(event_types) if event_types else None, consumer))
+        return consumer
+
+    def unsubscribe(self, consumer: Consumer):
+        self._consumers = [(types, c) for types, c in self._consumers if c is not consumer]
+
+    def _pending(self):
+        """Неотправленные события, еще не исчерпавшие попытки доставки"""
+        # SKIP LOCKED: несколько процессов приложения разбирают outbox без ожидания друг друга
+        return (
+            select(OutboxEvent)
+            .where(OutboxEvent.processed_at.is_(None), OutboxEvent.attempts < self.max_attempts)
+            .order_by(OutboxEvent.id)
+            .with_for_update(skip_locked=True)
+        )
+
+    async def _deliver(self, db: AsyncSession, events: List[OutboxEvent]):
+        """Передать события потребителям и отметить их обработанными (без commit)"""
+        for event_types, consumer in self._consumers:
+            selected = [event for event in events if event_types is None or event.event_type in event_types]
+            if selected:
+                await consumer(db, selected)
+        await db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_([event.id for event in events]))
+            .values(processed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def dispatch_once(self) -> int:
+        """Доставить одну пачку событий; вернуть число доставленных"""
+        async with self.session_factory() as db:
+            events = (await db.scalars(self._pending().limit(self.batch_size))).all()
+            if not events:
+                self.metrics.record_lag(0.0)
+                return 0
+
+            self.metrics.record_lag((datetime.utcnow() - events[0].created_at).total_seconds())
+            event_ids = [event.id for event in events]
+            try:
+                await self._deliver(db, events)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Ошибка при обработке пачки событий outbox: {str(e)}")
+                self.metrics.record_failure(str(e))
+                # Пачка повторяется по одному событию: попытка засчитывается только
+                # сбойным событиям, а исправные доставляются сразу
+                delivered = await self._dispatch_each(db, event_ids)
+            else:
+                delivered = len(event_ids)
+
+        self.metrics.record_batch(delivered)
+        return delivered
+
+    async def _dispatch_each(self, db: AsyncSession, event_ids: List[int]) -> int:
+        """Доставить события по одному в отдельных транзакциях"""
+        delivered = 0
+        for event_id in event_ids:
+            event = await db.scalar(self._pending().where(OutboxEvent.id == event_id))
+            if event is None:
+                # Уже обработано другим процессом или заблокировано им
+                continue
+            try:
+                await self._deliver(db, [event])
+                await db.commit()
+                delivered += 1
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Ошибка при обработке события outbox {event_id}: {str(e)}")
+                await db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id == event_id)
+                    .values(attempts=OutboxEvent.attempts + 1, last_error=str(e)[:1000])
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                self.metrics.record_event_failure(str(e))
+        return delivered
+
+    async def run(self):
+        """Фоновая задача: доставлять события, пока они есть, затем ждать interval"""
+        while True:
+            try:
+                delivered = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Ошибка диспетчера outbox: {str(e)}")
+                delivered = 0
+            if delivered < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+
+# Диспетчер процесса; потребители подписываются при импорте своих модулей
+outbox_dispatcher = OutboxDispatcher()
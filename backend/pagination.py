@@ -0,0 +1,65 @@
+"""
+Курсорная (keyset) пагинация.
+
+Курсор — непрозрачная для клиента строка (base64 от JSON) с ключом сортировки
+последней отданной строки. Следующая страница выбирается условием
+«(ключ, id) > (последний ключ, последний id)», которое использует индекс
+и не зависит от глубины страницы, в отличие от OFFSET.
+"""
+import base64
+import json
+from typing import Any, Dict, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+# Максимальный размер страницы списков с пагинацией
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    """Упаковать состояние пагинации в непрозрачный курсор"""
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Распаковать курсор, полученный от клиента"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return data
+
+
+def keyset_order(columns: Sequence[Any], descending: bool = False) -> list:
+    """ORDER BY для keyset-пагинации; NULL в ключе сортировки идут последними"""
+    order = [column.desc() if descending else column.asc() for column in columns]
+    if len(order) > 1:
+        order[0] = order[0].nulls_last()
+    return order
+
+
+def keyset_condition(columns: Sequence[Any], values: Sequence[Any], descending: bool = False):
+    """Условие выборки строк, следующих за позицией курсора
+
+    Ключ сортировки (первый столбец) может быть NULL: такие строки идут в конце
+    (см. keyset_order), а сравнение кортежей их не выбирает, поэтому область
+    NULL обрабатывается отдельной веткой.
+    """
+    if len(columns) != len(values):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+    def after(columns, values):
+        if descending:
+            return tuple_(*columns) < tuple(values)
+        return tuple_(*columns) > tuple(values)
+
+    if len(columns) == 1:
+        return after(columns, values)
+    if values[0] is None:
+        return and_(columns[0].is_(None), after(columns[1:], values[1:]))
+    return or_(after(columns, values), columns[0].is_(None))
@@ -0,0 +1,87 @@
+"""
+Денормализованная модель чтения каталога (таблица car_listings).
+
+Таблица всегда поддерживается в актуальном состоянии: обработчики, меняющие
+автомобили, продавцов или магазины, вызывают функции этого модуля в той же
+транзакции. Чтение из нее для GET /cars и /queries/* включается переменной
+CAR_READ_MODEL=true. Заполнить таблицу заново можно командой
+python -m backend.read_model.
+"""
+import asyncio
+from os import environ
+from typing import Iterable
+
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.schemas import Car, CarListing, Seller, Store
+from backend.schemas.database import AsyncSessionLocal
+
+# Читать каталог из car_listings вместо соединения cars/sellers/stores
+CAR_READ_MODEL = environ.get("CAR_READ_MODEL", "false").lower() == "true"
+
+LISTING_COLUMNS = (
+    "id", "brand", "model", "year", "power", "transmission", "condition", "mileage",
+    "features", "price", "status", "seller_id", "seller_name", "store_id", "store_name",
+)
+
+
+def _listing_select():
+    """Проекция каталога из нормализованных таблиц (порядок — LISTING_COLUMNS)"""
+    return (
+        select(
+            Car.id, Car.brand, Car.model, Car.year, Car.power, Car.transmission,
+            Car.condition, Car.mileage, Car.features, Car.price, Car.status,
+            Car.seller_id, Seller.full_name, Car.store_id, Store.name,
+        )
+        .outerjoin(Car.seller)
+        .outerjoin(Car.store)
+    )
+
+
+async def refresh_car_listings(db: AsyncSession, car_ids: Iterable[int]):
+    """Пересобрать строки проекции для автомобилей (после вставки или изменения)"""
+    car_ids = list(car_ids)
+    if not car_ids:
+        return
+    # Несохраненные изменения ORM должны попасть в cars до INSERT ... SELECT
+    await db.flush()
+    await db.execute(delete(CarListing).where(CarListing.id.in_(car_ids)))
+    await db.execute(
+        insert(CarListing).from_select(LISTING_COLUMNS, _listing_select().where(Car.id.in_(car_ids)))
+    )
+
+
+async def remove_car_listings(db: AsyncSession, car_ids: Iterable[int]):
+    """Удалить строки проекции удаленных автомобилей"""
+    car_ids = list(car_ids)
+    if car_ids:
+        await db.execute(delete(CarListing).where(CarListing.id.in_(car_ids)))
+
+
+async def seller_renamed(db: AsyncSession, seller_id: int, full_name: str):
+    """Обновить имя продавца во всех его объявлениях"""
+    await db.execute(
+        update(CarListing).where(CarListing.seller_id == seller_id).values(seller_name=full_name)
+    )
+
+
+async def seller_deleted(db: AsyncSession, seller_id: int):
+    """Удалить объявления удаленного продавца (его автомобили удаляются каскадом)"""
+    await db.execute(delete(CarListing).where(CarListing.seller_id == seller_id))
+
+
+async def rebuild_car_listings(db: AsyncSession):
+    """Полностью заполнить проекцию заново из таблиц cars, sellers и stores"""
+    await db.execute(delete(CarListing))
+    await db.execute(insert(CarListing).from_select(LISTING_COLUMNS, _listing_select()))
+    await db.commit()
+
+
+async def _rebuild():
+    async with AsyncSessionLocal() as db:
+        await rebuild_car_listings(db)
+
+
+if __name__ == "__main__":
+    asyncio.run(_rebuild())
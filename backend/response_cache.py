@@ -0,0 +1,148 @@
+"""
+Кэш ответов публичных GET-эндпоинтов.
+
+Ключ записи — путь и нормализованные параметры запроса плюс версии
+пространств имен («cars», «stores», «buyers»), от которых зависит ответ.
+Запись в соответствующие таблицы увеличивает версию пространства, и старые
+записи перестают использоваться (и вытесняются по LRU/TTL).
+
+По умолчанию кэш хранится в памяти процесса; для общего кэша между
+процессами можно установить другой бэкенд через set_backend() (например,
+поверх Redis). Бэкенд — объект с асинхронными методами, как у MemoryCacheBackend:
+
+    get(key) -> Optional[CachedResponse]
+    set(key, value)
+    get_version(namespace) -> int   (0, если версии еще нет)
+    incr(namespace) -> int
+    clear()
+"""
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from os import environ
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from backend.cache import TTLCache
+
+RESPONSE_CACHE_TTL_SECONDS = float(environ.get("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_SIZE = int(environ.get("RESPONSE_CACHE_SIZE", "1000"))
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """Закэшированное тело ответа и его валидаторы"""
+    body: Any
+    etag: str
+    last_modified: float
+
+
+class MemoryCacheBackend:
+    """Бэкенд в памяти процесса"""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = {}
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: CachedResponse):
+        self._entries.set(key, value)
+
+    async def get_version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    async def incr(self, namespace: str) -> int:
+        self._versions[namespace] = self._versions.get(namespace, 0) + 1
+        return self._versions[namespace]
+
+    async def clear(self):
+        self._entries.clear()
+        self._versions.clear()
+
+
+def _etag(*parts: str) -> str:
+    return '"' + hashlib.sha1("|".join(parts).encode()).hexdigest() + '"'
+
+
+class ResponseCache:
+    """Кэш ответов с версионной инвалидацией и поддержкой ETag/304"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryCacheBackend()
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    async def invalidate(self, *namespaces: str):
+        """Сделать устаревшими все ответы, зависящие от пространств имен"""
+        for namespace in namespaces:
+            await self.backend.incr(namespace)
+
+    async def clear(self):
+        await self.backend.clear()
+
+    async def _key(self, request: Request, namespaces: Sequence[str]) -> str:
+        params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        versions = [f"{ns}:{await self.backend.get_version(ns)}" for ns in sorted(namespaces)]
+        return f"{request.url.path}?{params}#{','.join(versions)}"
+
+    async def get_or_compute(
+        self,
+        request: Request,
+        namespaces: Sequence[str],
+        compute: Callable[[], Awaitable[Any]],
+    ) -> CachedResponse:
+        """Вернуть закэшированный ответ или вычислить и сохранить его"""
+        key = await self._key(request, namespaces)
+        entry = await self.backend.get(key)
+        if entry is None:
+            body = await compute()
+            serialized = json.dumps(body, sort_keys=True, default=str)
+            entry = CachedResponse(body=body, etag=_etag(serialized), last_modified=time.time())
+            await self.backend.set(key, entry)
+        return entry
+
+    async def serve(self, request: Request, namespaces: Sequence[str], compute: Callable[[], Awaitable[Any]]) -> Response:
+        """Ответ из кэша (или вычисленный) с учетом условных заголовков запроса"""
+        return self.respond(request, await self.get_or_compute(request, namespaces, compute))
+
+    def respond(self, request: Request, entry: CachedResponse, body: Any = None, variant: Optional[str] = None) -> Response:
+        """JSON-ответ с ETag/Last-Modified либо 304, если клиентская копия актуальна
+
+        body и variant задают персонализированную версию ответа (например,
+        с отметками избранного); variant входит в ETag.
+        """
+        etag = _etag(entry.etag, variant) if variant else entry.etag
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            "Vary": "Authorization",
+        }
+        if self._not_modified(request, etag, entry.last_modified):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(content=entry.body if body is None else body, headers=headers)
+
+    @staticmethod
+    def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+# Кэш процесса, используемый роутерами
+response_cache = ResponseCache()
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from typing import Dict, Any
 import logging
@@ -9,9 +10,12 @@ from backend.schemas.database import get_db
 from backend.schemas import Buyer, Seller
 from backend.models import BuyerCreate, SellerCreate
 from backend.auth import (
-    get_password_hash, verify_password, create_access_token,
+    get_password_hash_async, verify_and_update_password_async, create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from backend.matching import buyer_matcher
+from backend.response_cache import response_cache
+from backend.analytics import mark_market_snapshot_stale
 from pydantic import BaseModel
 
 # Настройка логирования
@@ -31,14 +35,14 @@ class TokenData(BaseModel):
     role: str
 
 @router.post("/register/buyer", response_model=Dict[str, Any])
-async def register_buyer(buyer: BuyerCreate, db: Session = Depends(get_db)):
+async def register_buyer(buyer: BuyerCreate, db: AsyncSession = Depends(get_db)):
     """Регистрация нового покупателя"""
     # Логирование начала обработки регистрации
     logger.info(f"Начата регистрация покупателя с email: {buyer.email}")
 
     # Проверка существования email
-    existing_buyer = db.query(Buyer).filter(Buyer.email == buyer.email).first()
-    existing_seller = db.query(Seller).filter(Seller.email == buyer.email).first()
+    existing_buyer = await db.scalar(select(Buyer).where(Buyer.email == buyer.email))
+    existing_seller = await db.scalar(select(Seller).where(Seller.email == buyer.email))
 
     if existing_buyer or existing_seller:
         logger.warning(f"Попытка регистрации с уже существующим email: {buyer.email}")
@@ -51,7 +55,7 @@ async def register_buyer(buyer: BuyerCreate, db: Session = Depends(get_db)):
         # Создание нового покупателя
         db_buyer = Buyer(
             email=buyer.email,
-            password_hash=get_password_hash(buyer.password),
+            password_hash=await get_password_hash_async(buyer.password),
             full_name=buyer.full_name,
             contact_info=buyer.contact_info,
             preferred_brand=buyer.preferred_brand or None,
@@ -65,28 +69,31 @@ async def register_buyer(buyer: BuyerCreate, db: Session = Depends(get_db)):
             max_price=buyer.max_price or None
         )
         db.add(db_buyer)
-        db.commit()
-        db.refresh(db_buyer)
+        await mark_market_snapshot_stale(db)
+        await db.commit()
+        await db.refresh(db_buyer)
+        buyer_matcher.buyer_updated(db_buyer)
+        await response_cache.invalidate("buyers")
 
         logger.info(f"Покупатель успешно зарегистрирован: {buyer.email}, ID: {db_buyer.id}")
         return {"message": "Покупатель успешно зарегистрирован", "id": db_buyer.id}
     except Exception as e:
         logger.error(f"Ошибка при регистрации покупателя: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при регистрации: {str(e)}"
         )
 
 @router.post("/register/seller", response_model=Dict[str, Any])
-async def register_seller(seller: SellerCreate, db: Session = Depends(get_db)):
+async def register_seller(seller: SellerCreate, db: AsyncSession = Depends(get_db)):
     """Регистрация нового продавца/админа"""
     # Логирование начала обработки регистрации
     logger.info(f"Начата регистрация продавца с email: {seller.email}")
 
     # Проверка существования email
-    existing_buyer = db.query(Buyer).filter(Buyer.email == seller.email).first()
-    existing_seller = db.query(Seller).filter(Seller.email == seller.email).first()
+    existing_buyer = await db.scalar(select(Buyer).where(Buyer.email == seller.email))
+    existing_seller = await db.scalar(select(Seller).where(Seller.email == seller.email))
 
     if existing_buyer or existing_seller:
         logger.warning(f"Попытка регистрации с уже существующим email: {seller.email}")
@@ -99,36 +106,36 @@ async def register_seller(seller: SellerCreate, db: Session = Depends(get_db)):
         # Создание нового продавца
         db_seller = Seller(
             email=seller.email,
-            password_hash=get_password_hash(seller.password),
+            password_hash=await get_password_hash_async(seller.password),
             full_name=seller.full_name,
             contact_info=seller.contact_info
         )
         db.add(db_seller)
-        db.commit()
-        db.refresh(db_seller)
+        await db.commit()
+        await db.refresh(db_seller)
 
         logger.info(f"Продавец успешно зарегистрирован: {seller.email}, ID: {db_seller.id}")
         return {"message": "Продавец успешно зарегистрирован", "id": db_seller.id}
     except Exception as e:
         logger.error(f"Ошибка при регистрации продавца: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при регистрации: {str(e)}"
         )
 
 @router.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """Авторизация пользователя"""
     logger.info(f"Попытка авторизации пользователя: {form_data.username}")
 
     # Сначала ищем пользователя как покупателя
-    user = db.query(Buyer).filter(Buyer.email == form_data.username).first()
+    user = await db.scalar(select(Buyer).where(Buyer.email == form_data.username))
     role = "buyer"
 
     # Если не найден, ищем как продавца
     if not user:
-        user = db.query(Seller).filter(Seller.email == form_data.username).first()
+        user = await db.scalar(select(Seller).where(Seller.email == form_data.username))
         role = "seller"  # Может быть и админом, но обрабатываем одинаково
 
     # Логирование результатов поиска пользователя
@@ -141,7 +148,8 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
         )
 
     # Проверка пароля
-    if not verify_password(form_data.password, user.password_hash):
+    is_valid, new_hash = await verify_and_update_password_async(form_data.password, user.password_hash)
+    if not is_valid:
         logger.warning(f"Неверный пароль для пользователя: {form_data.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -149,6 +157,12 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Хеш со старой стоимостью bcrypt пересчитывается прозрачно для пользователя
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+        logger.info(f"Хеш пароля обновлен для пользователя: {form_data.username}")
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email, "role": role}, expires_delta=access_token_expires
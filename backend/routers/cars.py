@@ -1,73 +1,452 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import (
+    select, insert, update, delete, func, exists, and_, or_, case, union_all,
+    type_coerce, cast, literal, literal_column, String,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Union, AsyncIterator
+from pydantic import ValidationError
+from os import environ
+import csv
+import io
 import json
+import re
 
 from backend.schemas.database import get_db
-from backend.schemas import Car, Store, Deal, Favorite
-from backend.models import CarCreate, CarStatusUpdate
+from backend.schemas import Car, CarListing, Store, Deal, Favorite, Buyer, Seller
+from backend.models import CarCreate, CarStatusUpdate, CarBulkStatusUpdate, CarBulkDelete
 from backend.auth import get_current_seller, get_current_user_optional
+from backend.pagination import encode_cursor, decode_cursor, keyset_condition, keyset_order, MAX_PAGE_SIZE
+from backend.response_cache import response_cache
+from backend import read_model
+from backend.read_model import refresh_car_listings, remove_car_listings
+from backend.deal_lifecycle import ACTIVE_DEAL_STATUSES
+from backend.outbox import publish_event, publish_events
+from backend.analytics import mark_market_snapshot_stale
 
 router = APIRouter(tags=["cars"])
 
-@router.get("", response_model=List[Dict[str, Any]])
+# Число строк, читаемых из серверного курсора за раз при выгрузке каталога
+CARS_EXPORT_BATCH_SIZE = int(environ.get("CARS_EXPORT_BATCH_SIZE", "1000"))
+
+# Колонки выгрузки каталога (порядок колонок CSV)
+EXPORT_COLUMNS = (
+    "id", "brand", "model", "year", "power", "transmission", "condition",
+    "mileage", "features", "price", "seller_name", "store_name", "status",
+)
+
+# Массовая загрузка: максимум строк в запросе и размер пачки INSERT
+CARS_BULK_MAX_ROWS = int(environ.get("CARS_BULK_MAX_ROWS", "10000"))
+CARS_BULK_BATCH_SIZE = int(environ.get("CARS_BULK_BATCH_SIZE", "1000"))
+
+# Допустимые статусы автомобиля (активные статусы сделок — в backend.deal_lifecycle)
+CAR_STATUSES = ["active", "inactive", "sold"]
+
+# Границы ценовых диапазонов и шаг диапазонов годов для фасетов каталога
+PRICE_FACET_BOUNDS = (10000, 20000, 30000, 50000, 100000)
+YEAR_FACET_STEP = 5
+
+# Поля, по которым допускается сортировка каталога (id — ключ-разделитель)
+CAR_SORT_COLUMNS = ("id", "price", "year")
+
+def features_contain(dialect_name: str, features: List[str], column=Car.features):
+    """Условие: автомобиль имеет все перечисленные опции"""
+    if dialect_name == "postgresql":
+        # Оператор @> по JSONB использует GIN-индекс ix_cars_features
+        return type_coerce(column, JSONB).contains(features)
+    # Прочие СУБД (SQLite в тестах): поиск каждого элемента через json_each
+    conditions = []
+    for feature in features:
+        items = func.json_each(column).table_valued("value")
+        conditions.append(exists(select(1).select_from(items).where(items.c.value == feature)))
+    return and_(*conditions)
+
+class CarFilters:
+    """Фильтры каталога, общие для списка и выгрузки автомобилей"""
+
+    def __init__(
+        self,
+        brand: Optional[str] = None,
+        model: Optional[str] = None,
+        min_year: Optional[int] = None,
+        max_year: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        condition: Optional[str] = None,
+        transmission: Optional[str] = None,
+        max_mileage: Optional[int] = None,
+        features: Optional[List[str]] = Query(None),
+        status: Optional[str] = None,
+    ):
+        self.brand = brand
+        self.model = model
+        self.min_year = min_year
+        self.max_year = max_year
+        self.min_price = min_price
+        self.max_price = max_price
+        self.condition = condition
+        self.transmission = transmission
+        self.max_mileage = max_mileage
+        self.features = features
+        self.status = status
+
+    def apply(self, query, dialect_name: str, source=Car):
+        """Добавить условия фильтрации к запросу (source — Car или CarListing)"""
+        if self.brand:
+            query = query.where(source.brand.ilike(f"%{self.brand}%"))
+        if self.model:
+            query = query.where(source.model.ilike(f"%{self.model}%"))
+        if self.min_year:
+            query = query.where(source.year >= self.min_year)
+        if self.max_year:
+            query = query.where(source.year <= self.max_year)
+        if self.min_price:
+            query = query.where(source.price >= self.min_price)
+        if self.max_price:
+            query = query.where(source.price <= self.max_price)
+        if self.condition:
+            query = query.where(source.condition == self.condition)
+        if self.transmission:
+            query = query.where(source.transmission == self.transmission)
+        if self.max_mileage:
+            query = query.where(source.mileage <= self.max_mileage)
+        if self.features:
+            query = query.where(features_contain(dialect_name, self.features, source.features))
+        if self.status:
+            query = query.where(source.status == self.status)
+        return query
+
+def listing_item(car) -> Dict[str, Any]:
+    """Автомобиль (Car с продавцом и магазином или CarListing) в формате каталога"""
+    if isinstance(car, CarListing):
+        seller_name, store_name = car.seller_name, car.store_name
+    else:
+        seller_name = car.seller.full_name if car.seller else None
+        store_name = car.store.name if car.store else None
+    return {
+        "id": car.id,
+        "brand": car.brand,
+        "model": car.model,
+        "year": car.year,
+        "power": car.power,
+        "transmission": car.transmission,
+        "condition": car.condition,
+        "mileage": car.mileage,
+        "features": car.features,
+        "price": car.price,
+        "seller_name": seller_name,
+        "store_name": store_name,
+        "status": car.status,
+    }
+
+def search_terms(q: str) -> List[str]:
+    """Слова поискового запроса (без символов синтаксиса tsquery)"""
+    return re.findall(r"\w+", q.lower())
+
+async def favorite_car_ids_for(db: AsyncSession, current_user, car_ids: List[int]) -> set:
+    """Какие из car_ids в избранном текущего покупателя (пусто для остальных)
+
+    Проверяются только автомобили страницы (car_id IN (...)) по уникальному
+    индексу (buyer_id, car_id), а не все избранное покупателя.
+    """
+    if not isinstance(current_user, Buyer) or not car_ids:
+        return set()
+    favorite_ids = await db.scalars(select(Favorite.car_id).where(
+        Favorite.buyer_id == current_user.id,
+        Favorite.car_id.in_(car_ids)
+    ))
+    return set(favorite_ids)
+
+def favorites_variant(car_ids: List[int], favorite_car_ids: set) -> Optional[str]:
+    """Часть ETag, зависящая от избранного пользователя"""
+    marked = sorted(car_id for car_id in car_ids if car_id in favorite_car_ids)
+    return ",".join(map(str, marked)) if marked else None
+
+@router.get("", response_model=Union[List[Dict[str, Any]], Dict[str, Any]])
 async def get_all_cars(
-    skip: int = 0,
-    limit: int = 100,
-    brand: Optional[str] = None,
-    model: Optional[str] = None,
-    min_year: Optional[int] = None,
-    max_year: Optional[int] = None,
-    min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    condition: Optional[str] = None,
-    transmission: Optional[str] = None,
-    max_mileage: Optional[int] = None,
-    db: Session = Depends(get_db),
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    pagination: str = "offset",
+    cursor: Optional[str] = None,
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    filters: CarFilters = Depends(),
+    db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user_optional)
 ):
-    """Получить список всех автомобилей с фильтрацией (доступно без авторизации)"""
-    query = db.query(Car)
-
-    # Применяем фильтры
-    if brand:
-        query = query.filter(Car.brand.ilike(f"%{brand}%"))
-    if model:
-        query = query.filter(Car.model.ilike(f"%{model}%"))
-    if min_year:
-        query = query.filter(Car.year >= min_year)
-    if max_year:
-        query = query.filter(Car.year <= max_year)
-    if min_price:
-        query = query.filter(Car.price >= min_price)
-    if max_price:
-        query = query.filter(Car.price <= max_price)
-    if condition:
-        query = query.filter(Car.condition == condition)
-    if transmission:
-        query = query.filter(Car.transmission == transmission)
-    if max_mileage:
-        query = query.filter(Car.mileage <= max_mileage)
-
-    cars = query.offset(skip).limit(limit).all()
-
-    favorite_car_ids = set()
-    if current_user and hasattr(current_user, "favorites"):
-        favorite_ids = db.query(Favorite.car_id).filter(Favorite.buyer_id == current_user.id).all()
-        favorite_car_ids = {fid[0] for fid in favorite_ids}
+    """Получить список всех автомобилей с фильтрацией (доступно без авторизации)
+
+    pagination=offset — прежний режим skip/limit, ответ — список.
+    pagination=cursor — keyset-пагинация, ответ — {"items": [...], "next_cursor": ...}.
+
+    Общая часть ответа кэшируется (см. backend/response_cache.py), отметки
+    is_favorite накладываются поверх нее для каждого покупателя.
+    """
+    if pagination not in ("offset", "cursor"):
+        raise HTTPException(status_code=400, detail="Недопустимый режим пагинации. Допустимые значения: ['offset', 'cursor']")
+    if sort_by not in CAR_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Недопустимое поле сортировки. Допустимые значения: {list(CAR_SORT_COLUMNS)}")
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Недопустимый порядок сортировки. Допустимые значения: ['asc', 'desc']")
+
+    async def compute():
+        if read_model.CAR_READ_MODEL:
+            # Денормализованная проекция: чтение одной таблицы без соединений
+            source = CarListing
+            query = select(CarListing)
+        else:
+            source = Car
+            # Продавец и магазин подгружаются тем же запросом (без N+1)
+            query = select(Car).options(joinedload(Car.seller), joinedload(Car.store))
+
+        query = filters.apply(query, db.bind.dialect.name, source)
+
+        # Сортировка с id в качестве ключа-разделителя делает порядок детерминированным;
+        # автомобили без цены или года идут последними
+        sort_column = getattr(source, sort_by)
+        descending = sort_order == "desc"
+        order_columns = [sort_column, source.id] if sort_by != "id" else [source.id]
+        query = query.order_by(*keyset_order(order_columns, descending))
+
+        next_cursor = None
+        if pagination == "cursor":
+            if cursor:
+                state = decode_cursor(cursor)
+                if state.get("sort_by") != sort_by or state.get("sort_order") != sort_order:
+                    raise HTTPException(status_code=400, detail="Курсор не соответствует параметрам сортировки")
+                query = query.where(keyset_condition(order_columns, state.get("values") or [], descending))
+
+            # Берем на одну строку больше, чтобы узнать, есть ли следующая страница
+            cars = (await db.scalars(query.limit(limit + 1))).all()
+            if len(cars) > limit:
+                cars = cars[:limit]
+                last = cars[-1]
+                next_cursor = encode_cursor({
+                    "sort_by": sort_by,
+                    "sort_order": sort_order,
+                    "values": [getattr(last, column.key) for column in order_columns],
+                })
+        else:
+            cars = (await db.scalars(query.offset(skip).limit(limit))).all()
+
+        result = [{**listing_item(car), "is_favorite": False} for car in cars]
+
+        if pagination == "cursor":
+            return {"items": result, "next_cursor": next_cursor}
+        return result
+
+    entry = await response_cache.get_or_compute(request, ["cars"], compute)
+    items = entry.body["items"] if pagination == "cursor" else entry.body
+    favorite_car_ids = await favorite_car_ids_for(db, current_user, [car["id"] for car in items])
+    if not favorite_car_ids:
+        return response_cache.respond(request, entry)
+
+    items = [{**car, "is_favorite": car["id"] in favorite_car_ids} for car in items]
+    body = {**entry.body, "items": items} if pagination == "cursor" else items
+    variant = favorites_variant([car["id"] for car in items], favorite_car_ids)
+    return response_cache.respond(request, entry, body=body, variant=variant)
+
+@router.get("/export")
+async def export_cars(
+    format: str = "ndjson",
+    filters: CarFilters = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    """Потоковая выгрузка каталога в NDJSON или CSV (фильтры — как у списка)
+
+    Строки читаются из серверного курсора пачками по CARS_EXPORT_BATCH_SIZE
+    и сразу отправляются клиенту, поэтому память не зависит от размера каталога.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Недопустимый формат. Допустимые значения: ['ndjson', 'csv']")
+
+    query = (
+        select(
+            Car.id, Car.brand, Car.model, Car.year, Car.power, Car.transmission,
+            Car.condition, Car.mileage, Car.features, Car.price,
+            Seller.full_name.label("seller_name"), Store.name.label("store_name"), Car.status,
+        )
+        .outerjoin(Car.seller)
+        .outerjoin(Car.store)
+        .order_by(Car.id)
+        .execution_options(yield_per=CARS_EXPORT_BATCH_SIZE)
+    )
+    query = filters.apply(query, db.bind.dialect.name)
 
-    # Преобразуем в словарь с дополнительной информацией
-    result = []
-    for car in cars:
-        # Десериализуем features из JSON строки в список
-        features = None
-        if car.features:
-            try:
-                features = json.loads(car.features)
-            except json.JSONDecodeError:
-                features = car.features
+    async def generate() -> AsyncIterator[str]:
+        # Сессия зависимости закрывается до отправки тела ответа: поток заново
+        # берет соединение и сам возвращает его в пул по завершении
+        try:
+            result = await db.stream(query)
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(EXPORT_COLUMNS)
+                yield buffer.getvalue()
+            async for partition in result.mappings().partitions():
+                if format == "csv":
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer)
+                    for row in partition:
+                        writer.writerow([
+                            ";".join(row["features"] or []) if column == "features" else row[column]
+                            for column in EXPORT_COLUMNS
+                        ])
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(
+                        json.dumps(dict(row), ensure_ascii=False) + "\n" for row in partition
+                    )
+        finally:
+            await db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="cars.{format}"'},
+    )
 
-        car_dict = {
+@router.get("/search", response_model=List[Dict[str, Any]])
+async def search_cars(
+    request: Request,
+    q: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    filters: CarFilters = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    """Полнотекстовый поиск по марке, модели и опциям с ранжированием
+
+    Последнее слово запроса ищется по префиксу (автодополнение). Фильтры —
+    как у списка. В PostgreSQL используется GIN-индекс ix_cars_search_vector.
+    """
+    terms = search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Пустой поисковый запрос")
+
+    async def compute():
+        dialect_name = db.bind.dialect.name
+        query = select(Car).options(joinedload(Car.seller), joinedload(Car.store))
+        if dialect_name == "postgresql":
+            search_vector = literal_column("cars.search_vector")
+            # Конфигурация 'simple' — та же, что в выражении search_vector (без стемминга)
+            ts_query = func.to_tsquery(
+                literal_column("'simple'::regconfig"),
+                " & ".join(terms[:-1] + [f"{terms[-1]}:*"]),
+            )
+            rank = func.ts_rank(search_vector, ts_query).label("rank")
+            query = query.add_columns(rank).where(search_vector.op("@@")(ts_query)).order_by(rank.desc(), Car.id)
+        else:
+            # Прочие СУБД (SQLite в тестах): каждое слово должно встретиться в марке, модели или опциях
+            rank = literal(0).label("rank")
+            query = query.add_columns(rank).order_by(Car.id)
+            for term in terms:
+                pattern = f"%{term}%"
+                query = query.where(or_(
+                    Car.brand.ilike(pattern),
+                    Car.model.ilike(pattern),
+                    cast(Car.features, String).ilike(pattern),
+                ))
+        query = filters.apply(query, dialect_name)
+
+        rows = (await db.execute(query.offset(skip).limit(limit))).unique().all()
+        return [{**listing_item(car), "rank": rank} for car, rank in rows]
+
+    return await response_cache.serve(request, ["cars"], compute)
+
+@router.get("/facets", response_model=Dict[str, Any])
+async def get_car_facets(
+    request: Request,
+    filters: CarFilters = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    """Количество автомобилей по марке, состоянию, коробке, годам и ценам
+
+    Фильтры — как у списка; все счетчики считаются одним запросом
+    (UNION ALL группировок по общему отфильтрованному набору).
+    """
+    async def compute():
+        source = CarListing if read_model.CAR_READ_MODEL else Car
+        # Автомобили без цены не попадают ни в один ценовой диапазон
+        price_bucket = case(
+            (source.price.is_(None), None),
+            *((source.price < bound, index) for index, bound in enumerate(PRICE_FACET_BOUNDS)),
+            else_=len(PRICE_FACET_BOUNDS),
+        )
+        filtered = filters.apply(
+            select(
+                source.brand,
+                source.condition,
+                source.transmission,
+                (source.year // YEAR_FACET_STEP).label("year_bucket"),
+                price_bucket.label("price_bucket"),
+            ),
+            db.bind.dialect.name,
+            source,
+        ).cte("filtered")
+
+        def facet(name: str, column):
+            return (
+                select(literal(name).label("facet"), cast(column, String).label("value"), func.count().label("count"))
+                .select_from(filtered)
+                .group_by(column)
+            )
+
+        rows = (await db.execute(union_all(
+            select(literal("total"), literal(None, String), func.count()).select_from(filtered),
+            facet("brand", filtered.c.brand),
+            facet("condition", filtered.c.condition),
+            facet("transmission", filtered.c.transmission),
+            facet("year", filtered.c.year_bucket),
+            facet("price", filtered.c.price_bucket),
+        ))).all()
+
+        result = {"total": 0, "brand": [], "condition": [], "transmission": [], "year": [], "price": []}
+        for name, value, count in rows:
+            if name == "total":
+                result["total"] = count
+            elif name == "year":
+                if value is not None:
+                    start = int(value) * YEAR_FACET_STEP
+                    result["year"].append({"from": start, "to": start + YEAR_FACET_STEP - 1, "count": count})
+            elif name == "price":
+                if value is not None:
+                    index = int(value)
+                    result["price"].append({
+                        "from": PRICE_FACET_BOUNDS[index - 1] if index > 0 else 0,
+                        "to": PRICE_FACET_BOUNDS[index] if index < len(PRICE_FACET_BOUNDS) else None,
+                        "count": count,
+                    })
+            else:
+                result[name].append({"value": value, "count": count})
+
+        for name in ("brand", "condition", "transmission"):
+            result[name].sort(key=lambda item: (-item["count"], item["value"] or ""))
+        result["year"].sort(key=lambda item: item["from"])
+        result["price"].sort(key=lambda item: item["from"])
+        return result
+
+    return await response_cache.serve(request, ["cars"], compute)
+
+@router.get("/{car_id}", response_model=Dict[str, Any])
+async def get_car_details(
+    car_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user_optional)
+):
+    """Получить детальную информацию об автомобиле (доступно без авторизации)"""
+    async def compute():
+        car = await db.get(Car, car_id, options=[joinedload(Car.seller), joinedload(Car.store)])
+        if not car:
+            raise HTTPException(status_code=404, detail="Автомобиль не найден")
+
+        return {
             "id": car.id,
             "brand": car.brand,
             "model": car.model,
@@ -76,82 +455,43 @@ async def get_all_cars(
             "transmission": car.transmission,
             "condition": car.condition,
             "mileage": car.mileage,
-            "features": features,
+            "features": car.features,
             "price": car.price,
-            "seller_name": car.seller.full_name if car.seller else None,
-            "store_name": car.store.name if car.store else None,
             "status": car.status,
-            "is_favorite": car.id in favorite_car_ids
+            "is_favorite": False,
+            "seller": {
+                "name": car.seller.full_name,
+                "contact_info": car.seller.contact_info
+            } if car.seller else None,
+            "store": {
+                "name": car.store.name,
+                "address": car.store.address
+            } if car.store else None
         }
-        result.append(car_dict)
-
-    return result
 
-@router.get("/{car_id}", response_model=Dict[str, Any])
-async def get_car_details(
-    car_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user_optional)
-):
-    """Получить детальную информацию об автомобиле (доступно без авторизации)"""
-    car = db.query(Car).filter(Car.id == car_id).first()
-    if not car:
-        raise HTTPException(status_code=404, detail="Автомобиль не найден")
-
-    is_favorite = False
-    if current_user and hasattr(current_user, "favorites"):
-        is_favorite = db.query(Favorite).filter(
+    entry = await response_cache.get_or_compute(request, ["cars"], compute)
+    if isinstance(current_user, Buyer):
+        is_favorite = await db.scalar(select(Favorite.id).where(
             Favorite.buyer_id == current_user.id,
             Favorite.car_id == car_id
-        ).first() is not None
-
-    # Десериализуем features из JSON строки в список
-    features = None
-    if car.features:
-        try:
-            features = json.loads(car.features)
-        except json.JSONDecodeError:
-            features = car.features
-
-    return {
-        "id": car.id,
-        "brand": car.brand,
-        "model": car.model,
-        "year": car.year,
-        "power": car.power,
-        "transmission": car.transmission,
-        "condition": car.condition,
-        "mileage": car.mileage,
-        "features": features,
-        "price": car.price,
-        "status": car.status,
-        "is_favorite": is_favorite,
-        "seller": {
-            "name": car.seller.full_name,
-            "contact_info": car.seller.contact_info
-        } if car.seller else None,
-        "store": {
-            "name": car.store.name,
-            "address": car.store.address
-        } if car.store else None
-    }
+        )) is not None
+        if is_favorite:
+            return response_cache.respond(request, entry, body={**entry.body, "is_favorite": True}, variant=str(car_id))
+    return response_cache.respond(request, entry)
 
 @router.post("", response_model=Dict[str, Any])
 async def add_car(
     car: CarCreate,
     current_user = Depends(get_current_seller),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Добавить новый автомобиль (только для продавцов/админов)"""
     # Проверка существования магазина
     if car.store_id:
-        store = db.query(Store).filter(Store.id == car.store_id).first()
+        store = await db.get(Store, car.store_id)
         if not store:
             raise HTTPException(status_code=404, detail="Магазин не найден")
 
-    # Преобразуем список features в JSON строку
-    features_json = json.dumps(car.features) if car.features else None
-
     db_car = Car(
         brand=car.brand,
         model=car.model,
@@ -160,27 +500,259 @@ async def add_car(
         transmission=car.transmission,
         condition=car.condition,
         mileage=car.mileage,
-        features=features_json,
+        features=car.features or None,
         price=car.price,
         status=car.status or "active",
         seller_id=current_user.id,
         store_id=car.store_id
     )
     db.add(db_car)
-    db.commit()
-    db.refresh(db_car)
+    await db.flush()
+    await refresh_car_listings(db, [db_car.id])
+    await publish_event(db, "car.created", db_car.id)
+    await mark_market_snapshot_stale(db)
+    await db.commit()
+    await db.refresh(db_car)
+    await response_cache.invalidate("cars")
 
     return {"message": "Автомобиль успешно добавлен", "id": db_car.id}
 
+def parse_bulk_rows(data: str, fmt: str) -> List[Any]:
+    """Разобрать тело массовой загрузки (json, ndjson или csv) в список строк"""
+    if fmt == "csv":
+        rows = []
+        for row in csv.DictReader(io.StringIO(data)):
+            # Пустые ячейки считаются незаполненными полями
+            row = {key: value for key, value in row.items() if key and value not in (None, "")}
+            if "features" in row:
+                row["features"] = [feature.strip() for feature in row["features"].split(";") if feature.strip()]
+            rows.append(row)
+        return rows
+
+    if fmt == "ndjson":
+        rows = []
+        for number, line in enumerate(data.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                raise HTTPException(status_code=400, detail=f"Некорректный JSON в строке {number}")
+        return rows
+
+    try:
+        rows = json.loads(data)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Некорректный JSON")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Ожидается массив автомобилей")
+    return rows
+
+async def read_bulk_rows(request: Request) -> List[Any]:
+    """Строки массовой загрузки из тела запроса или загруженного файла"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Файл не передан")
+        name = (upload.filename or "").lower()
+        if name.endswith(".csv") or upload.content_type == "text/csv":
+            fmt = "csv"
+        elif name.endswith((".ndjson", ".jsonl")) or upload.content_type == "application/x-ndjson":
+            fmt = "ndjson"
+        else:
+            fmt = "json"
+        data = await upload.read()
+    else:
+        fmt = "csv" if "csv" in content_type else "ndjson" if "ndjson" in content_type else "json"
+        data = await request.body()
+
+    try:
+        return parse_bulk_rows(data.decode("utf-8-sig"), fmt)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Файл должен быть в кодировке UTF-8")
+
+@router.post("/bulk", response_model=Dict[str, Any])
+async def add_cars_bulk(
+    request: Request,
+    current_user = Depends(get_current_seller),
+    db: AsyncSession = Depends(get_db)
+):
+    """Массовое добавление автомобилей (только для продавцов/админов)
+
+    Принимает JSON-массив, NDJSON или CSV (телом запроса или файлом в поле file).
+    Строки с ошибками пропускаются и перечисляются в ответе, остальные
+    вставляются пачками по CARS_BULK_BATCH_SIZE в одной транзакции.
+    """
+    rows = await read_bulk_rows(request)
+    if len(rows) > CARS_BULK_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"Слишком много строк: максимум {CARS_BULK_MAX_ROWS}")
+
+    errors = []
+    valid = []
+    for number, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"row": number, "errors": ["Ожидается объект автомобиля"]})
+            continue
+        try:
+            valid.append((number, CarCreate(**row)))
+        except ValidationError as e:
+            errors.append({
+                "row": number,
+                "errors": [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()],
+            })
+
+    # Существование всех магазинов проверяется одним запросом
+    store_ids = {car.store_id for _, car in valid if car.store_id}
+    existing_store_ids = set()
+    if store_ids:
+        existing_store_ids = set(await db.scalars(select(Store.id).where(Store.id.in_(store_ids))))
+
+    values = []
+    for number, car in valid:
+        if car.store_id and car.store_id not in existing_store_ids:
+            errors.append({"row": number, "errors": ["Магазин не найден"]})
+            continue
+        values.append({
+            "brand": car.brand,
+            "model": car.model,
+            "year": car.year,
+            "power": car.power,
+            "transmission": car.transmission,
+            "condition": car.condition,
+            "mileage": car.mileage,
+            "features": car.features or None,
+            "price": car.price,
+            "status": car.status or "active",
+            "seller_id": current_user.id,
+            "store_id": car.store_id,
+        })
+
+    ids = []
+    for start in range(0, len(values), CARS_BULK_BATCH_SIZE):
+        batch = values[start:start + CARS_BULK_BATCH_SIZE]
+        ids.extend(await db.scalars(insert(Car).returning(Car.id, sort_by_parameter_order=True), batch))
+    if ids:
+        await refresh_car_listings(db, ids)
+        await publish_events(db, "car.created", ids)
+        await mark_market_snapshot_stale(db)
+        await db.commit()
+        await response_cache.invalidate("cars")
+
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "message": f"Добавлено автомобилей: {len(ids)}",
+        "created": len(ids),
+        "ids": ids,
+        "errors": errors,
+    }
+
+async def check_owned_cars(db: AsyncSession, car_ids: List[int], seller_id: int, lock: bool = False):
+    """Разделить id на принадлежащие продавцу и ошибочные одним запросом
+
+    lock=True блокирует строки автомобилей до конца транзакции, поэтому
+    новые сделки по ним (внешний ключ на cars) не появятся до ее завершения.
+    """
+    car_ids = list(dict.fromkeys(car_ids))
+    owners = {}
+    if car_ids:
+        query = select(Car.id, Car.seller_id).where(Car.id.in_(car_ids))
+        if lock:
+            query = query.with_for_update()
+        owners = dict((await db.execute(query)).all())
+
+    owned, errors = [], []
+    for car_id in car_ids:
+        if car_id not in owners:
+            errors.append({"car_id": car_id, "error": "Автомобиль не найден"})
+        elif owners[car_id] != seller_id:
+            errors.append({"car_id": car_id, "error": "Нет прав на этот автомобиль"})
+        else:
+            owned.append(car_id)
+    return owned, errors
+
+@router.patch("/bulk/status", response_model=Dict[str, Any])
+async def update_cars_status_bulk(
+    status_update: CarBulkStatusUpdate,
+    current_user = Depends(get_current_seller),
+    db: AsyncSession = Depends(get_db)
+):
+    """Массово обновить статус автомобилей (только собственных)"""
+    status = status_update.status
+    if status not in CAR_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Недопустимый статус. Допустимые значения: {CAR_STATUSES}")
+
+    owned, errors = await check_owned_cars(db, status_update.car_ids, current_user.id)
+    if owned:
+        # seller_id в условии защищает от смены владельца между проверкой и обновлением
+        await db.execute(
+            update(Car)
+            .where(Car.id.in_(owned), Car.seller_id == current_user.id)
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        await refresh_car_listings(db, owned)
+        await publish_events(db, "car.status_changed", owned, {"status": status})
+        await db.commit()
+        await response_cache.invalidate("cars")
+
+    return {
+        "message": f"Статус обновлен на {status} у автомобилей: {len(owned)}",
+        "updated": owned,
+        "errors": errors,
+    }
+
+@router.post("/bulk/delete", response_model=Dict[str, Any])
+async def delete_cars_bulk(
+    request_data: CarBulkDelete,
+    current_user = Depends(get_current_seller),
+    db: AsyncSession = Depends(get_db)
+):
+    """Массово удалить автомобили (только собственные и без активных сделок)"""
+    owned, errors = await check_owned_cars(db, request_data.car_ids, current_user.id, lock=True)
+
+    if owned:
+        # Автомобили с активными сделками определяются одним запросом
+        blocked = set(await db.scalars(
+            select(Deal.car_id).where(Deal.car_id.in_(owned), Deal.status.in_(ACTIVE_DEAL_STATUSES)).distinct()
+        ))
+        errors.extend(
+            {"car_id": car_id, "error": "Нельзя удалить автомобиль с активными сделками"}
+            for car_id in owned if car_id in blocked
+        )
+        owned = [car_id for car_id in owned if car_id not in blocked]
+
+    if owned:
+        # Избранное и завершенные сделки удаляются так же, как каскадом при delete_car
+        await db.execute(delete(Favorite).where(Favorite.car_id.in_(owned)))
+        await db.execute(delete(Deal).where(Deal.car_id.in_(owned)))
+        await db.execute(
+            delete(Car)
+            .where(Car.id.in_(owned), Car.seller_id == current_user.id)
+            .execution_options(synchronize_session=False)
+        )
+        await remove_car_listings(db, owned)
+        await publish_events(db, "car.deleted", owned)
+        await mark_market_snapshot_stale(db)
+        await db.commit()
+        await response_cache.invalidate("cars")
+
+    return {
+        "message": f"Удалено автомобилей: {len(owned)}",
+        "deleted": owned,
+        "errors": errors,
+    }
+
 @router.put("/{car_id}", response_model=Dict[str, Any])
 async def update_car(
     car_id: int,
     car_update: CarCreate,
     current_user = Depends(get_current_seller),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Обновить информацию об автомобиле (только владелец автомобиля)"""
-    car = db.query(Car).filter(Car.id == car_id).first()
+    car = await db.get(Car, car_id)
     if not car:
         raise HTTPException(status_code=404, detail="Автомобиль не найден")
 
@@ -188,9 +760,6 @@ async def update_car(
     if car.seller_id != current_user.id:
         raise HTTPException(status_code=403, detail="У вас нет прав на обновление этого автомобиля")
 
-    # Преобразуем список features в JSON строку
-    features_json = json.dumps(car_update.features) if car_update.features else None
-
     # Обновление полей автомобиля
     car.brand = car_update.brand
     car.model = car_update.model
@@ -199,12 +768,16 @@ async def update_car(
     car.transmission = car_update.transmission
     car.condition = car_update.condition
     car.mileage = car_update.mileage
-    car.features = features_json
+    car.features = car_update.features or None
     car.price = car_update.price
     car.store_id = car_update.store_id
 
-    db.commit()
-    db.refresh(car)
+    await refresh_car_listings(db, [car.id])
+    await publish_event(db, "car.updated", car.id)
+    await mark_market_snapshot_stale(db)
+    await db.commit()
+    await db.refresh(car)
+    await response_cache.invalidate("cars")
 
     return {"message": "Информация об автомобиле успешно обновлена"}
 
@@ -213,10 +786,10 @@ async def update_car_status(
     car_id: int,
     status_update: CarStatusUpdate,
     current_user = Depends(get_current_seller),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Обновить статус автомобиля (только владелец автомобиля)"""
-    car = db.query(Car).filter(Car.id == car_id).first()
+    car = await db.get(Car, car_id)
     if not car:
         raise HTTPException(status_code=404, detail="Автомобиль не найден")
 
@@ -225,13 +798,15 @@ async def update_car_status(
 
     status = status_update.status
 
-    valid_statuses = ["active", "inactive", "sold"]
-    if status not in valid_statuses:
-        raise HTTPException(status_code=400, detail=f"Недопустимый статус. Допустимые значения: {valid_statuses}")
+    if status not in CAR_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Недопустимый статус. Допустимые значения: {CAR_STATUSES}")
 
     car.status = status
-    db.commit()
-    db.refresh(car)
+    await refresh_car_listings(db, [car.id])
+    await publish_event(db, "car.status_changed", car.id, {"status": status})
+    await db.commit()
+    await db.refresh(car)
+    await response_cache.invalidate("cars")
 
     return {"message": f"Статус автомобиля обновлен на {status}"}
 
@@ -239,10 +814,10 @@ async def update_car_status(
 async def delete_car(
     car_id: int,
     current_user = Depends(get_current_seller),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Удалить автомобиль (только владелец)"""
-    car = db.query(Car).filter(Car.id == car_id).first()
+    car = await db.get(Car, car_id)
     if not car:
         raise HTTPException(status_code=404, detail="Автомобиль не найден")
 
@@ -251,38 +826,36 @@ async def delete_car(
         raise HTTPException(status_code=403, detail="У вас нет прав на удаление этого автомобиля")
 
     # Проверка активных сделок
-    active_deals = db.query(Deal).filter(
+    active_deals = await db.scalar(select(Deal).where(
         Deal.car_id == car_id,
-        Deal.status.in_(["pending", "approved"])
-    ).first()
+        Deal.status.in_(ACTIVE_DEAL_STATUSES)
+    ))
 
     if active_deals:
         raise HTTPException(status_code=400, detail="Нельзя удалить автомобиль с активными сделками")
 
-    db.delete(car)
-    db.commit()
+    await db.delete(car)
+    await remove_car_listings(db, [car.id])
+    await publish_event(db, "car.deleted", car.id)
+    await mark_market_snapshot_stale(db)
+    await db.commit()
+    await response_cache.invalidate("cars")
 
     return {"message": "Автомобиль успешно удален"}
 
 # Функция для получения автомобилей продавца, доступная для импорта
 async def get_seller_cars(
     current_user = Depends(get_current_seller),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Получить список автомобилей текущего продавца"""
-    cars = db.query(Car).filter(Car.seller_id == current_user.id).all()
+    cars = (await db.scalars(
+        select(Car).options(joinedload(Car.store)).where(Car.seller_id == current_user.id)
+    )).all()
 
     # Преобразуем в словарь с дополнительной информацией
     result = []
     for car in cars:
-        # Десериализуем features из JSON строки в список
-        features = None
-        if car.features:
-            try:
-                features = json.loads(car.features)
-            except json.JSONDecodeError:
-                features = car.features
-
         car_dict = {
             "id": car.id,
             "brand": car.brand,
@@ -292,7 +865,7 @@ async def get_seller_cars(
             "transmission": car.transmission,
             "condition": car.condition,
             "mileage": car.mileage,
-            "features": features,
+            "features": car.features,
             "price": car.price,
             "store_name": car.store.name if car.store else None,
             "status": car.status
@@ -1,121 +1,197 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from sqlalchemy import select, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Union
+from datetime import datetime
 
-from backend.schemas.database import get_db
-from backend.schemas import Deal, Car
+from backend.schemas.database import get_db, dialect_insert
+from backend.schemas import Deal, Car, Buyer, Seller, DEAL_STATUSES
 from backend.auth import get_current_buyer, get_current_seller, get_current_user
+from backend.pagination import encode_cursor, decode_cursor, keyset_condition, keyset_order, MAX_PAGE_SIZE
+from backend.deal_lifecycle import transition_deal
+from backend.response_cache import response_cache
+from backend.outbox import publish_event
 
 router = APIRouter(tags=["deals"])
 
+def deal_insert_statement(dialect_name: str, car_id: int, buyer_id: int):
+    """INSERT ... SELECT ожидающей заявки на активный автомобиль с ON CONFLICT DO NOTHING"""
+    status_type = Deal.__table__.c.status.type
+    return (
+        dialect_insert(dialect_name, Deal)
+        .from_select(
+            ["car_id", "buyer_id", "price", "status", "deal_date"],
+            select(
+                Car.id,
+                literal(buyer_id),
+                Car.price,
+                # Тип колонки, а не VARCHAR: в PostgreSQL status — перечисление deal_status,
+                # и приведения varchar -> deal_status при вставке нет
+                literal("pending", status_type),
+                literal(datetime.utcnow())
+            )
+            .where(Car.id == car_id, Car.status == "active")
+        )
+        .on_conflict_do_nothing(
+            index_elements=["car_id", "buyer_id"],
+            # Предикат — константа, а не параметр: иначе при generic-плане подготовленного
+            # выражения PostgreSQL не сопоставит его с частичным индексом
+            index_where=text("status = 'pending'")
+        )
+        .returning(Deal.id)
+    )
+
 @router.post("", response_model=Dict[str, Any])
 async def create_deal(
     car_id: int,
     current_user = Depends(get_current_buyer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Создать заявку на покупку автомобиля (только для покупателей)"""
-    # Проверка существования автомобиля
-    car = db.query(Car).filter(Car.id == car_id).first()
-    if not car:
-        raise HTTPException(status_code=404, detail="Автомобиль не найден")
-
-    # Проверка наличия активной сделки для этого автомобиля
-    existing_deal = db.query(Deal).filter(
-        Deal.car_id == car_id,
-        Deal.buyer_id == current_user.id,
-        Deal.status == "pending"
-    ).first()
-
-    if existing_deal:
-        raise HTTPException(status_code=400, detail="У вас уже есть заявка на этот автомобиль")
-
-    # Создание новой сделки
-    deal = Deal(
-        car_id=car_id,
-        buyer_id=current_user.id,
-        price=car.price,
-        status="pending"
-    )
-    db.add(deal)
-    db.commit()
-    db.refresh(deal)
+    """Создать заявку на покупку автомобиля (только для покупателей)
+
+    Заявка создается одним INSERT ... SELECT с ценой автомобиля и только на
+    автомобиль в статусе active; повторную ожидающую заявку отсекает частичный
+    уникальный индекс (ON CONFLICT), поэтому одновременные запросы не создают дублей.
+    """
+    statement = deal_insert_statement(db.bind.dialect.name, car_id, current_user.id)
+    deal_id = await db.scalar(statement)
+    if deal_id is not None:
+        await publish_event(db, "deal.created", deal_id, {"car_id": car_id, "buyer_id": current_user.id})
+    await db.commit()
 
-    return {"message": "Заявка успешно создана", "deal_id": deal.id}
+    if deal_id is None:
+        # Ни одной строки не вставлено: автомобиля нет, он снят с продажи
+        # или продан, либо заявка уже существует
+        car_status = (await db.execute(select(Car.status).where(Car.id == car_id))).first()
+        if car_status is None:
+            raise HTTPException(status_code=404, detail="Автомобиль не найден")
+        if car_status.status != "active":
+            raise HTTPException(status_code=409, detail="Автомобиль недоступен для покупки")
+        raise HTTPException(status_code=409, detail="У вас уже есть заявка на этот автомобиль")
 
-@router.get("/my", response_model=List[Dict[str, Any]])
+    return {"message": "Заявка успешно создана", "deal_id": deal_id}
+
+@router.get("/my", response_model=Union[List[Dict[str, Any]], Dict[str, Any]])
 async def get_my_deals(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    skip: int = Query(0, ge=0),
+    pagination: str = "offset",
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Получить список своих сделок"""
-    if hasattr(current_user, 'favorites'):  # Покупатель
-        deals = db.query(Deal).filter(Deal.buyer_id == current_user.id).all()
-        result = []
-        for deal in deals:
-            car = deal.car
-            result.append({
-                "id": deal.id,
-                "car": {
-                    "id": car.id,
-                    "brand": car.brand,
-                    "model": car.model,
-                    "year": car.year
-                },
-                "price": deal.price,
-                "status": deal.status,
-                "deal_date": deal.deal_date.isoformat(),
-                "seller_name": car.seller.full_name if car.seller else None
-            })
-        return result
-    else:  # Продавец
-        # Получаем все сделки для автомобилей этого продавца
-        deals = db.query(Deal).join(Car).filter(Car.seller_id == current_user.id).all()
-        result = []
-        for deal in deals:
-            car = deal.car
-            buyer = deal.buyer
-            result.append({
-                "id": deal.id,
-                "car": {
-                    "id": car.id,
-                    "brand": car.brand,
-                    "model": car.model,
-                    "year": car.year
-                },
-                "buyer": {
-                    "name": buyer.full_name,
-                    "contact": buyer.contact_info
-                },
-                "price": deal.price,
-                "status": deal.status,
-                "deal_date": deal.deal_date.isoformat()
-            })
-        return result
+    """Получить список своих сделок
+
+    Сделки, автомобили и вторая сторона сделки выбираются одним запросом
+    с соединениями; новые сделки идут первыми. Фильтры status и
+    date_from/date_to применяются в SQL.
+    pagination=cursor — keyset-пагинация по дате сделки,
+    ответ — {"items": [...], "next_cursor": ...}.
+    """
+    if pagination not in ("offset", "cursor"):
+        raise HTTPException(status_code=400, detail="Недопустимый режим пагинации. Допустимые значения: ['offset', 'cursor']")
+    if status is not None and status not in DEAL_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Недопустимый статус. Допустимые значения: {DEAL_STATUSES}")
+
+    is_buyer = isinstance(current_user, Buyer)
+    columns = [
+        Deal.id, Deal.price, Deal.status, Deal.deal_date,
+        Car.id.label("car_id"), Car.brand, Car.model, Car.year,
+    ]
+    if is_buyer:  # Покупатель: продавец автомобиля
+        query = (
+            select(*columns, Seller.full_name.label("seller_name"))
+            .join(Car, Car.id == Deal.car_id)
+            .outerjoin(Seller, Seller.id == Car.seller_id)
+            .where(Deal.buyer_id == current_user.id)
+        )
+    else:  # Продавец: сделки по его автомобилям и покупатели
+        query = (
+            select(*columns, Buyer.full_name.label("buyer_name"), Buyer.contact_info.label("buyer_contact"))
+            .join(Car, Car.id == Deal.car_id)
+            .outerjoin(Buyer, Buyer.id == Deal.buyer_id)
+            .where(Car.seller_id == current_user.id)
+        )
+
+    if status is not None:
+        query = query.where(Deal.status == status)
+    if date_from is not None:
+        query = query.where(Deal.deal_date >= date_from)
+    if date_to is not None:
+        query = query.where(Deal.deal_date <= date_to)
+
+    # Deal.id — ключ-разделитель для сделок с одинаковой датой
+    order_columns = [Deal.deal_date, Deal.id]
+    query = query.order_by(*keyset_order(order_columns, descending=True))
+
+    next_cursor = None
+    if pagination == "cursor":
+        if cursor:
+            values = list(decode_cursor(cursor).get("values") or [])
+            if values and values[0] is not None:
+                try:
+                    values[0] = datetime.fromisoformat(values[0])
+                except (TypeError, ValueError):
+                    raise HTTPException(status_code=400, detail="Некорректный курсор")
+            query = query.where(keyset_condition(order_columns, values, descending=True))
+
+        rows = (await db.execute(query.limit(limit + 1))).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            deal_date = last.deal_date.isoformat() if last.deal_date else None
+            next_cursor = encode_cursor({"values": [deal_date, last.id]})
+    else:
+        rows = (await db.execute(query.offset(skip).limit(limit))).all()
+
+    result = []
+    for row in rows:
+        item = {
+            "id": row.id,
+            "car": {
+                "id": row.car_id,
+                "brand": row.brand,
+                "model": row.model,
+                "year": row.year
+            },
+            "price": row.price,
+            "status": row.status,
+            "deal_date": row.deal_date.isoformat() if row.deal_date else None
+        }
+        if is_buyer:
+            item["seller_name"] = row.seller_name
+        else:
+            item["buyer"] = {
+                "name": row.buyer_name,
+                "contact": row.buyer_contact
+            }
+        result.append(item)
+
+    if pagination == "cursor":
+        return {"items": result, "next_cursor": next_cursor}
+    return result
 
 @router.put("/{deal_id}/status", response_model=Dict[str, Any])
 async def update_deal_status(
     deal_id: int,
     status: str = Query(..., description="Статус сделки: pending, approved, rejected, completed"),
     current_user = Depends(get_current_seller),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Обновить статус сделки (только для продавцов/админов)"""
-    deal = db.query(Deal).filter(Deal.id == deal_id).first()
-    if not deal:
-        raise HTTPException(status_code=404, detail="Сделка не найдена")
-
-    # Проверка, что текущий пользователь владеет автомобилем
-    if deal.car.seller_id != current_user.id:
-        raise HTTPException(status_code=403, detail="У вас нет прав на обновление этой сделки")
-
-    # Проверка валидности статуса
-    valid_statuses = ["pending", "approved", "rejected", "completed"]
-    if status not in valid_statuses:
-        raise HTTPException(status_code=400, detail=f"Недопустимый статус. Допустимые значения: {valid_statuses}")
+    """Обновить статус сделки (только для продавцов/админов)
 
-    # Обновление статуса
-    deal.status = status
-    db.commit()
+    Допустимые переходы — см. backend.deal_lifecycle. Завершение сделки
+    помечает автомобиль проданным и отклоняет остальные заявки на него.
+    """
+    transition = await transition_deal(db, deal_id, current_user.id, status)
+    await db.commit()
+    if transition.car_sold:
+        await response_cache.invalidate("cars")
 
-    return {"message": f"Статус сделки обновлен на {status}"}
\ No newline at end of file
+    return {
+        "message": f"Статус сделки обновлен на {status}",
+        "rejected_deal_ids": transition.rejected_deal_ids
+    }
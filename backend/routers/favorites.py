@@ -1,80 +1,144 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-import json
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, literal
+from sqlalchemy.orm import contains_eager
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional, Union
 
-from backend.schemas.database import get_db
+from backend.schemas.database import get_db, dialect_insert
 from backend.schemas import Favorite, Car
 from backend.auth import get_current_buyer
+from backend.pagination import encode_cursor, decode_cursor, keyset_condition, keyset_order, MAX_PAGE_SIZE
+from backend.outbox import publish_event
 
 router = APIRouter(tags=["favorites"])
 
+# Поля, по которым допускается сортировка избранного
+FAVORITE_SORT_COLUMNS = {
+    "added_at": Favorite.added_at,
+    "price": Car.price,
+}
+
 @router.post("/{car_id}", response_model=Dict[str, Any])
 async def add_to_favorites(
     car_id: int,
     current_user = Depends(get_current_buyer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Добавить автомобиль в избранное (только для покупателей)"""
-    # Проверка, что автомобиль существует
-    car = db.query(Car).filter(Car.id == car_id).first()
-    if not car:
-        raise HTTPException(status_code=404, detail="Автомобиль не найден")
-
-    # Проверка, что автомобиль уже не в избранном
-    existing = db.query(Favorite).filter(
-        Favorite.buyer_id == current_user.id,
-        Favorite.car_id == car_id
-    ).first()
+    # Одна вставка вместо «проверить, затем вставить»: строка появляется, только если
+    # автомобиль существует, а дубликат отсекается уникальным ограничением без гонки
+    stmt = (
+        dialect_insert(db.bind.dialect.name, Favorite)
+        .from_select(
+            ["buyer_id", "car_id", "added_at"],
+            select(literal(current_user.id), Car.id, literal(datetime.utcnow())).where(Car.id == car_id)
+        )
+        .on_conflict_do_nothing(index_elements=["buyer_id", "car_id"])
+        .returning(Favorite.id)
+    )
+    favorite_id = await db.scalar(stmt)
+    if favorite_id is not None:
+        await publish_event(db, "favorite.added", car_id, {"buyer_id": current_user.id})
+    await db.commit()
 
-    if existing:
+    if favorite_id is None:
+        # Ничего не вставлено: автомобиля нет или он уже в избранном
+        if await db.get(Car, car_id) is None:
+            raise HTTPException(status_code=404, detail="Автомобиль не найден")
         raise HTTPException(status_code=400, detail="Автомобиль уже в избранном")
 
-    favorite = Favorite(buyer_id=current_user.id, car_id=car_id)
-    db.add(favorite)
-    db.commit()
-
     return {"message": "Автомобиль добавлен в избранное"}
 
 @router.delete("/{car_id}", response_model=Dict[str, Any])
 async def remove_from_favorites(
     car_id: int,
     current_user = Depends(get_current_buyer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Удалить автомобиль из избранного"""
-    favorite = db.query(Favorite).filter(
+    favorite = await db.scalar(select(Favorite).where(
         Favorite.buyer_id == current_user.id,
         Favorite.car_id == car_id
-    ).first()
+    ))
 
     if not favorite:
         raise HTTPException(status_code=404, detail="Автомобиль не в избранном")
 
-    db.delete(favorite)
-    db.commit()
+    await db.delete(favorite)
+    await publish_event(db, "favorite.removed", car_id, {"buyer_id": current_user.id})
+    await db.commit()
 
     return {"message": "Автомобиль удален из избранного"}
 
-@router.get("", response_model=List[Dict[str, Any]])
+@router.get("", response_model=Union[List[Dict[str, Any]], Dict[str, Any]])
 async def get_favorites(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    skip: int = Query(0, ge=0),
+    pagination: str = "offset",
+    cursor: Optional[str] = None,
+    sort_by: str = "added_at",
+    sort_order: str = "desc",
     current_user = Depends(get_current_buyer),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Получить список избранных автомобилей"""
-    favorites = db.query(Favorite).filter(Favorite.buyer_id == current_user.id).all()
+    """Получить список избранных автомобилей
+
+    Автомобили загружаются тем же запросом, сортировка — в SQL.
+    pagination=cursor — keyset-пагинация, ответ — {"items": [...], "next_cursor": ...}.
+    """
+    if pagination not in ("offset", "cursor"):
+        raise HTTPException(status_code=400, detail="Недопустимый режим пагинации. Допустимые значения: ['offset', 'cursor']")
+    if sort_by not in FAVORITE_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Недопустимое поле сортировки. Допустимые значения: {list(FAVORITE_SORT_COLUMNS)}")
+    if sort_order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Недопустимый порядок сортировки. Допустимые значения: ['asc', 'desc']")
+
+    query = (
+        select(Favorite)
+        .join(Favorite.car)
+        .options(contains_eager(Favorite.car))
+        .where(Favorite.buyer_id == current_user.id)
+    )
+
+    # Favorite.id — ключ-разделитель для одинаковых значений сортировки
+    descending = sort_order == "desc"
+    order_columns = [FAVORITE_SORT_COLUMNS[sort_by], Favorite.id]
+    query = query.order_by(*keyset_order(order_columns, descending))
+
+    next_cursor = None
+    if pagination == "cursor":
+        if cursor:
+            state = decode_cursor(cursor)
+            if state.get("sort_by") != sort_by or state.get("sort_order") != sort_order:
+                raise HTTPException(status_code=400, detail="Курсор не соответствует параметрам сортировки")
+            values = list(state.get("values") or [])
+            if sort_by == "added_at" and values and values[0] is not None:
+                try:
+                    values[0] = datetime.fromisoformat(values[0])
+                except (TypeError, ValueError):
+                    raise HTTPException(status_code=400, detail="Некорректный курсор")
+            query = query.where(keyset_condition(order_columns, values, descending))
+
+        favorites = (await db.scalars(query.limit(limit + 1))).all()
+        if len(favorites) > limit:
+            favorites = favorites[:limit]
+            last = favorites[-1]
+            if sort_by == "added_at":
+                sort_value = last.added_at.isoformat() if last.added_at else None
+            else:
+                sort_value = last.car.price
+            next_cursor = encode_cursor({
+                "sort_by": sort_by,
+                "sort_order": sort_order,
+                "values": [sort_value, last.id],
+            })
+    else:
+        favorites = (await db.scalars(query.offset(skip).limit(limit))).all()
 
     result = []
     for fav in favorites:
         car = fav.car
-        # Десериализуем features из JSON строки в список, если они есть
-        features = None
-        if car.features:
-            try:
-                features = json.loads(car.features)
-            except:
-                features = car.features
-
         result.append({
             "id": car.id,
             "brand": car.brand,
@@ -85,11 +149,13 @@ async def get_favorites(
             "transmission": car.transmission,
             "condition": car.condition,
             "power": car.power,
-            "features": features,
+            "features": car.features,
             "color": getattr(car, "color", None),
             "status": car.status,
             "added_at": fav.added_at.isoformat(),
             "is_favorite": True
         })
 
-    return result
\ No newline at end of file
+    if pagination == "cursor":
+        return {"items": result, "next_cursor": next_cursor}
+    return result
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any
+from datetime import datetime
+
+from backend.schemas.database import get_db
+from backend.schemas import Notification, Car
+from backend.auth import get_current_buyer
+from backend.pagination import MAX_PAGE_SIZE
+
+router = APIRouter(tags=["notifications"])
+
+@router.get("", response_model=List[Dict[str, Any]])
+async def get_notifications(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    skip: int = Query(0, ge=0),
+    unread_only: bool = False,
+    current_user = Depends(get_current_buyer),
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить уведомления о новых автомобилях под предпочтения (только для покупателей)
+
+    Автомобили всех уведомлений страницы загружаются одним запросом;
+    удаленные к этому моменту автомобили не показываются.
+    """
+    query = select(Notification).where(Notification.buyer_id == current_user.id)
+    if unread_only:
+        query = query.where(Notification.read_at.is_(None))
+    notifications = (await db.scalars(
+        query.order_by(Notification.id.desc()).offset(skip).limit(limit)
+    )).all()
+
+    car_ids = {car_id for notification in notifications for car_id in notification.car_ids}
+    cars = {}
+    if car_ids:
+        rows = await db.execute(
+            select(Car.id, Car.brand, Car.model, Car.year, Car.price, Car.status)
+            .where(Car.id.in_(car_ids))
+        )
+        cars = {
+            row.id: {
+                "id": row.id,
+                "brand": row.brand,
+                "model": row.model,
+                "year": row.year,
+                "price": row.price,
+                "status": row.status
+            }
+            for row in rows
+        }
+
+    return [
+        {
+            "id": notification.id,
+            "kind": notification.kind,
+            "cars": [cars[car_id] for car_id in notification.car_ids if car_id in cars],
+            "created_at": notification.created_at.isoformat(),
+            "read": notification.read_at is not None
+        }
+        for notification in notifications
+    ]
+
+@router.post("/read", response_model=Dict[str, Any])
+async def mark_notifications_read(
+    current_user = Depends(get_current_buyer),
+    db: AsyncSession = Depends(get_db)
+):
+    """Отметить все уведомления покупателя прочитанными"""
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.buyer_id == current_user.id, Notification.read_at.is_(None))
+        .values(read_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    return {"message": "Уведомления отмечены как прочитанные", "updated": result.rowcount}
@@ -1,161 +1,242 @@
-from fastapi import APIRouter, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
+from datetime import datetime
 from fastapi import Depends
 
 from backend.schemas.database import get_db
-from backend.schemas import Buyer, Car
+from backend.schemas import Buyer, Car, CarListing
+from backend.analytics import compute_market_analysis, get_market_snapshot
+from backend.matching import buyer_matcher, BuyerPreferences, CarSpec
+from backend.response_cache import response_cache
+from backend import read_model
 
 router = APIRouter(tags=["queries"])
 
 @router.get("/buyers-for-car", response_model=List[Dict[str, Any]])
 async def find_buyers_for_car(
+    request: Request,
     brand: str,
     model: str,
     year: int,
     transmission: str,
     condition: str,
     price: float,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Найти покупателей для автомобиля с заданными параметрами"""
-    query = db.query(Buyer)
-
-    # Фильтрация по предпочтениям
-    if brand:
-        query = query.filter(
-            (Buyer.preferred_brand == None) | (Buyer.preferred_brand == brand)
-        )
-    if model:
-        query = query.filter(
-            (Buyer.preferred_model == None) | (Buyer.preferred_model == model)
-        )
+    async def compute():
+        await buyer_matcher.ensure_loaded(db)
+        buyer_ids = buyer_matcher.match(CarSpec(
+            brand=brand or None,
+            model=model or None,
+            year=year,
+            transmission=transmission or None,
+            condition=condition or None,
+            price=price
+        ))
+        if not buyer_ids:
+            return []
+
+        buyers = (await db.scalars(
+            select(Buyer).where(Buyer.id.in_(buyer_ids)).order_by(Buyer.id)
+        )).all()
+
+        return [
+            {
+                "id": buyer.id,
+                "full_name": buyer.full_name,
+                "contact_info": buyer.contact_info,
+                "max_price": buyer.max_price
+            }
+            for buyer in buyers
+        ]
 
-    query = query.filter(
-        (Buyer.min_year == None) | (Buyer.min_year <= year),
-        (Buyer.max_year == None) | (Buyer.max_year >= year),
-        (Buyer.preferred_transmission == None) | (Buyer.preferred_transmission == transmission),
-        (Buyer.preferred_condition == None) | (Buyer.preferred_condition == condition),
-        (Buyer.max_price == None) | (Buyer.max_price >= price)
-    )
+    return await response_cache.serve(request, ["buyers"], compute)
 
-    buyers = query.all()
+@router.post("/buyers-for-cars", response_model=List[Dict[str, Any]])
+async def find_buyers_for_cars(
+    car_ids: List[int] = Body(..., embed=True),
+    db: AsyncSession = Depends(get_db)
+):
+    """Пакетный поиск покупателей для списка автомобилей"""
+    await buyer_matcher.ensure_loaded(db)
+    rows = await db.execute(select(
+        Car.id, Car.brand, Car.model, Car.year, Car.power,
+        Car.transmission, Car.condition, Car.price
+    ).where(Car.id.in_(car_ids)))
+    matches = buyer_matcher.match_many(CarSpec.from_car(row) for row in rows)
 
     return [
-        {
-            "id": buyer.id,
-            "full_name": buyer.full_name,
-            "contact_info": buyer.contact_info,
-            "max_price": buyer.max_price
-        }
-        for buyer in buyers
+        {"car_id": car_id, "buyer_ids": matches[car_id]}
+        for car_id in car_ids
+        if car_id in matches
     ]
 
+@router.get("/cars-for-buyer", response_model=List[Dict[str, Any]])
+async def find_cars_for_buyer(
+    request: Request,
+    buyer_id: int,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    """Активные автомобили, подходящие под сохраненные предпочтения покупателя"""
+    async def compute():
+        buyer = await db.get(Buyer, buyer_id)
+        if not buyer:
+            raise HTTPException(status_code=404, detail="Покупатель не найден")
+
+        preferences = BuyerPreferences.from_buyer(buyer)
+        source = CarListing if read_model.CAR_READ_MODEL else Car
+        cars = (await db.scalars(
+            select(source)
+            .where(source.status == "active", *preferences.car_conditions(source))
+            .order_by(source.price, source.id)
+            .limit(limit)
+        )).all()
+
+        return [
+            {
+                "id": car.id,
+                "brand": car.brand,
+                "model": car.model,
+                "year": car.year,
+                "power": car.power,
+                "transmission": car.transmission,
+                "condition": car.condition,
+                "mileage": car.mileage,
+                "price": car.price
+            }
+            for car in cars
+        ]
+
+    return await response_cache.serve(request, ["cars", "buyers"], compute)
+
 @router.get("/buyers-by-model", response_model=List[Dict[str, Any]])
-async def get_buyers_by_model(model: str, db: Session = Depends(get_db)):
+async def get_buyers_by_model(request: Request, model: str, db: AsyncSession = Depends(get_db)):
     """Покупатели, желающие приобрести автомобиль заданной модели"""
-    buyers = db.query(Buyer).filter(Buyer.preferred_model == model).all()
-
-    return [
-        {
-            "id": buyer.id,
-            "full_name": buyer.full_name,
-            "contact_info": buyer.contact_info,
-            "preferences": {
-                "brand": buyer.preferred_brand,
-                "year_range": f"{buyer.min_year or 'любой'}-{buyer.max_year or 'любой'}",
-                "max_price": buyer.max_price
+    async def compute():
+        buyers = (await db.scalars(select(Buyer).where(Buyer.preferred_model == model))).all()
+
+        return [
+            {
+                "id": buyer.id,
+                "full_name": buyer.full_name,
+                "contact_info": buyer.contact_info,
+                "preferences": {
+                    "brand": buyer.preferred_brand,
+                    "year_range": f"{buyer.min_year or 'любой'}-{buyer.max_year or 'любой'}",
+                    "max_price": buyer.max_price
+                }
             }
-        }
-        for buyer in buyers
-    ]
+            for buyer in buyers
+        ]
+
+    return await response_cache.serve(request, ["buyers"], compute)
 
 @router.get("/cars-low-mileage", response_model=List[Dict[str, Any]])
-async def get_cars_low_mileage(db: Session = Depends(get_db)):
+async def get_cars_low_mileage(request: Request, db: AsyncSession = Depends(get_db)):
     """Вывести список автомобилей с пробегом меньше 30 тыс. км"""
-    cars = db.query(Car).filter(Car.mileage < 30000).all()
+    async def compute():
+        source = CarListing if read_model.CAR_READ_MODEL else Car
+        cars = (await db.scalars(select(source).where(source.mileage < 30000))).all()
+
+        return [
+            {
+                "id": car.id,
+                "brand": car.brand,
+                "model": car.model,
+                "year": car.year,
+                "mileage": car.mileage,
+                "price": car.price,
+                "condition": car.condition
+            }
+            for car in cars
+        ]
 
-    return [
-        {
-            "id": car.id,
-            "brand": car.brand,
-            "model": car.model,
-            "year": car.year,
-            "mileage": car.mileage,
-            "price": car.price,
-            "condition": car.condition
-        }
-        for car in cars
-    ]
+    return await response_cache.serve(request, ["cars"], compute)
 
 @router.get("/new-cars", response_model=List[Dict[str, Any]])
-async def get_new_cars(db: Session = Depends(get_db)):
+async def get_new_cars(request: Request, db: AsyncSession = Depends(get_db)):
     """Вывести список новых автомобилей"""
-    cars = db.query(Car).filter(Car.condition == "new").all()
+    async def compute():
+        if read_model.CAR_READ_MODEL:
+            cars = (await db.scalars(select(CarListing).where(CarListing.condition == "new"))).all()
+        else:
+            cars = (await db.scalars(
+                select(Car).options(joinedload(Car.seller)).where(Car.condition == "new")
+            )).all()
+
+        return [
+            {
+                "id": car.id,
+                "brand": car.brand,
+                "model": car.model,
+                "year": car.year,
+                "power": car.power,
+                "transmission": car.transmission,
+                "price": car.price,
+                "seller_name": car.seller_name if isinstance(car, CarListing) else (
+                    car.seller.full_name if car.seller else None
+                )
+            }
+            for car in cars
+        ]
 
-    return [
-        {
+    return await response_cache.serve(request, ["cars"], compute)
+
+@router.get("/market-analysis", response_model=Dict[str, Any])
+async def get_market_analysis(request: Request, live: bool = False, db: AsyncSession = Depends(get_db)):
+    """Соотношение покупательной способности и суммарной стоимости автомобилей
+
+    Если есть свежий снимок (см. MARKET_SNAPSHOT_REFRESH_SECONDS), он возвращается
+    без пересчета; live=true принудительно считает анализ по текущим данным.
+    """
+    async def compute():
+        if not live:
+            snapshot = await get_market_snapshot(db)
+            if snapshot:
+                return {**snapshot.data, "computed_at": snapshot.computed_at.isoformat()}
+
+        analysis = await compute_market_analysis(db)
+        return {**analysis, "computed_at": datetime.utcnow().isoformat()}
+
+    return await response_cache.serve(request, ["cars", "buyers"], compute)
+
+@router.get("/most-expensive-car", response_model=Dict[str, Any])
+async def get_most_expensive_car(request: Request, db: AsyncSession = Depends(get_db)):
+    """Самый дорогой автомобиль"""
+    async def compute():
+        car = await db.scalar(
+            select(Car)
+            .options(joinedload(Car.seller), joinedload(Car.store))
+            .order_by(Car.price.desc())
+            .limit(1)
+        )
+
+        if not car:
+            raise HTTPException(status_code=404, detail="Автомобили не найдены")
+
+        return {
             "id": car.id,
             "brand": car.brand,
             "model": car.model,
             "year": car.year,
             "power": car.power,
             "transmission": car.transmission,
+            "condition": car.condition,
+            "mileage": car.mileage,
             "price": car.price,
-            "seller_name": car.seller.full_name if car.seller else None
+            "seller": {
+                "name": car.seller.full_name,
+                "contact": car.seller.contact_info
+            } if car.seller else None,
+            "store": {
+                "name": car.store.name,
+                "address": car.store.address
+            } if car.store else None
         }
-        for car in cars
-    ]
-
-@router.get("/market-analysis", response_model=Dict[str, Any])
-async def get_market_analysis(db: Session = Depends(get_db)):
-    """Соотношение покупательной способности и суммарной стоимости автомобилей"""
-    # Получение общей покупательной способности
-    buyers = db.query(Buyer).filter(Buyer.max_price != None).all()
-    total_buying_power = sum(buyer.max_price for buyer in buyers if buyer.max_price)
-
-    # Получение общей стоимости автомобилей
-    cars = db.query(Car).all()
-    total_car_value = sum(car.price for car in cars)
-
-    # Получение средних значений
-    avg_buyer_budget = total_buying_power / len(buyers) if buyers else 0
-    avg_car_price = total_car_value / len(cars) if cars else 0
-
-    return {
-        "total_buying_power": total_buying_power,
-        "total_car_value": total_car_value,
-        "ratio": total_buying_power / total_car_value if total_car_value > 0 else 0,
-        "average_buyer_budget": avg_buyer_budget,
-        "average_car_price": avg_car_price,
-        "buyers_count": len(buyers),
-        "cars_count": len(cars)
-    }
 
-@router.get("/most-expensive-car", response_model=Dict[str, Any])
-async def get_most_expensive_car(db: Session = Depends(get_db)):
-    """Самый дорогой автомобиль"""
-    car = db.query(Car).order_by(Car.price.desc()).first()
-
-    if not car:
-        raise HTTPException(status_code=404, detail="Автомобили не найдены")
-
-    return {
-        "id": car.id,
-        "brand": car.brand,
-        "model": car.model,
-        "year": car.year,
-        "power": car.power,
-        "transmission": car.transmission,
-        "condition": car.condition,
-        "mileage": car.mileage,
-        "price": car.price,
-        "seller": {
-            "name": car.seller.full_name,
-            "contact": car.seller.contact_info
-        } if car.seller else None,
-        "store": {
-            "name": car.store.name,
-            "address": car.store.address
-        } if car.store else None
-    }
\ No newline at end of file
+    return await response_cache.serve(request, ["cars"], compute)
\ No newline at end of file
@@ -1,39 +1,84 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
 
 from backend.schemas.database import get_db
-from backend.schemas import Store
+from backend.schemas import Store, Car
 from backend.auth import get_current_seller
+from backend.response_cache import response_cache
 
 router = APIRouter(tags=["stores"])
 
+# Статусы автомобилей, по которым считается разбивка в списке магазинов
+STORE_CAR_STATUSES = ("active", "sold", "inactive")
+
 @router.post("", response_model=Dict[str, Any])
 async def create_store(
     name: str,
     address: str,
     current_user = Depends(get_current_seller),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Создать новый магазин (только для продавцов/админов)"""
     store = Store(name=name, address=address)
     db.add(store)
-    db.commit()
-    db.refresh(store)
+    await db.commit()
+    await db.refresh(store)
+    await response_cache.invalidate("stores")
 
     return {"message": "Магазин успешно создан", "id": store.id}
 
 @router.get("", response_model=List[Dict[str, Any]])
-async def get_stores(db: Session = Depends(get_db)):
-    """Получить список всех магазинов"""
-    stores = db.query(Store).all()
-
-    return [
-        {
-            "id": store.id,
-            "name": store.name,
-            "address": store.address,
-            "cars_count": len(store.cars)
-        }
-        for store in stores
-    ]
\ No newline at end of file
+async def get_stores(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить список всех магазинов со статистикой по автомобилям"""
+    async def compute():
+        # Агрегаты по автомобилям считаются в SQL одним запросом вместе со списком
+        car_stats = (
+            select(
+                Car.store_id,
+                func.count(Car.id).label("cars_count"),
+                *(
+                    func.sum(case((Car.status == status, 1), else_=0)).label(f"{status}_count")
+                    for status in STORE_CAR_STATUSES
+                ),
+                func.min(Car.price).label("min_price"),
+                func.max(Car.price).label("max_price"),
+                func.avg(Car.price).label("average_price"),
+            )
+            .group_by(Car.store_id)
+            .subquery()
+        )
+        rows = (await db.execute(
+            select(Store, car_stats)
+            .outerjoin(car_stats, car_stats.c.store_id == Store.id)
+            .order_by(Store.id)
+            .offset(skip)
+            .limit(limit)
+        )).all()
+
+        return [
+            {
+                "id": row.Store.id,
+                "name": row.Store.name,
+                "address": row.Store.address,
+                "cars_count": row.cars_count or 0,
+                "status_counts": {
+                    status: getattr(row, f"{status}_count") or 0
+                    for status in STORE_CAR_STATUSES
+                },
+                "min_price": row.min_price,
+                "max_price": row.max_price,
+                "average_price": row.average_price,
+            }
+            for row in rows
+        ]
+
+    # Число автомобилей меняется вместе с каталогом
+    entry = await response_cache.get_or_compute(request, ["stores", "cars"], compute)
+    return response_cache.respond(request, entry)
\ No newline at end of file
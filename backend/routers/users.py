@@ -1,19 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.schemas.database import get_db
-from backend.schemas import Buyer, Seller
+from backend.schemas import Buyer, Seller, Car, Deal, Favorite
 from backend.models import BuyerUpdate, SellerUpdate
 
-from backend.auth import get_current_user
+from backend.auth import get_current_user, invalidate_user
+from backend.matching import buyer_matcher
+from backend.response_cache import response_cache
+from backend.read_model import seller_renamed, seller_deleted
+from backend.analytics import mark_market_snapshot_stale
+from backend.outbox import publish_events
 
 router = APIRouter(tags=["users"])
 
 @router.get("/profile", response_model=Dict[str, Any])
-async def get_profile(current_user = Depends(get_current_user)):
+async def get_profile(
+    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """Получить информацию о текущем пользователе"""
-    if hasattr(current_user, 'favorites'):  # Покупатель
+    if isinstance(current_user, Buyer):  # Покупатель
         return {
             "id": current_user.id,
             "email": current_user.email,
@@ -33,43 +42,55 @@ async def get_profile(current_user = Depends(get_current_user)):
             }
         }
     else:  # Продавец
+        cars_count = await db.scalar(
+            select(func.count(Car.id)).where(Car.seller_id == current_user.id)
+        )
         return {
             "id": current_user.id,
             "email": current_user.email,
             "full_name": current_user.full_name,
             "contact_info": current_user.contact_info,
             "role": "seller",
-            "cars_count": len(current_user.cars)
+            "cars_count": cars_count
         }
 
 @router.put("/profile", response_model=Dict[str, Any])
 async def update_profile(
     user_update: BuyerUpdate | SellerUpdate,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Обновить данные текущего пользователя"""
 
-    if hasattr(current_user, 'favorites'):  # Покупатель
-        buyer: Buyer = db.query(Buyer).filter(Buyer.id == current_user.id).first()
+    if isinstance(current_user, Buyer):  # Покупатель
+        buyer: Buyer = await db.get(Buyer, current_user.id)
         if not buyer:
             raise HTTPException(status_code=404, detail="Пользователь не найден")
         update_data = user_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(buyer, field, value)
-        db.commit()
-        db.refresh(buyer)
+        await mark_market_snapshot_stale(db)
+        await db.commit()
+        await db.refresh(buyer)
+        buyer_matcher.buyer_updated(buyer)
+        invalidate_user(buyer.email)
+        await response_cache.invalidate("buyers")
         current = buyer
         role = "buyer"
     else:
-        seller: Seller = db.query(Seller).filter(Seller.id == current_user.id).first()
+        seller: Seller = await db.get(Seller, current_user.id)
         if not seller:
             raise HTTPException(status_code=404, detail="Пользователь не найден")
         update_data = user_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(seller, field, value)
-        db.commit()
-        db.refresh(seller)
+        if "full_name" in update_data:
+            await seller_renamed(db, seller.id, seller.full_name)
+        await db.commit()
+        await db.refresh(seller)
+        invalidate_user(seller.email)
+        # Имя и контакты продавца входят в ответы по автомобилям
+        await response_cache.invalidate("cars")
         current = seller
         role = "seller"
 
@@ -86,19 +107,42 @@ async def update_profile(
 @router.delete("/profile", response_model=Dict[str, Any])
 async def delete_profile(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Удалить текущий аккаунт"""
+    """Удалить текущий аккаунт
+
+    Автомобили продавца, сделки и избранное покупателя удаляются каскадом;
+    события outbox о них записываются той же транзакцией.
+    """
 
-    if hasattr(current_user, 'favorites'):
-        user = db.query(Buyer).filter(Buyer.id == current_user.id).first()
+    if isinstance(current_user, Buyer):
+        user = await db.get(Buyer, current_user.id)
     else:
-        user = db.query(Seller).filter(Seller.id == current_user.id).first()
+        user = await db.get(Seller, current_user.id)
 
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    db.delete(user)
-    db.commit()
+    if isinstance(user, Buyer):
+        deal_ids = (await db.scalars(select(Deal.id).where(Deal.buyer_id == user.id))).all()
+        favorite_car_ids = (await db.scalars(select(Favorite.car_id).where(Favorite.buyer_id == user.id))).all()
+        await publish_events(db, "deal.deleted", deal_ids, {"buyer_id": user.id})
+        await publish_events(db, "favorite.removed", favorite_car_ids, {"buyer_id": user.id})
+    else:
+        # Сделки и избранное автомобилей продавца удаляются вместе с ними, как в delete_car
+        car_ids = (await db.scalars(select(Car.id).where(Car.seller_id == user.id))).all()
+        await publish_events(db, "car.deleted", car_ids)
+
+    await db.delete(user)
+    if isinstance(user, Seller):
+        await seller_deleted(db, user.id)
+    await mark_market_snapshot_stale(db)
+    await db.commit()
+    invalidate_user(user.email)
+    if isinstance(user, Buyer):
+        buyer_matcher.buyer_deleted(user.id)
+        await response_cache.invalidate("buyers")
+    else:
+        await response_cache.invalidate("cars")
 
     return {"message": "Пользователь удален"}
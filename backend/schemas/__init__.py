@@ -5,6 +5,10 @@ from .store import Store
 from .car import Car
 from .favorite import Favorite
 from .deal import Deal
+from .market_snapshot import MarketSnapshot
+from .car_listing import CarListing
+from .outbox_event import OutboxEvent
+from .notification import Notification
 
 __all__ = [
     "Base",
@@ -16,5 +20,9 @@ __all__ = [
     "Store",
     "Car",
     "Favorite",
-    "Deal"
+    "Deal",
+    "MarketSnapshot",
+    "CarListing",
+    "OutboxEvent",
+    "Notification"
 ]
\ No newline at end of file
@@ -1,9 +1,11 @@
 from sqlalchemy import create_engine, Column, Integer, String, Float, Text, DateTime, ForeignKey, Enum
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 
-Base = declarative_base()
+# AsyncAttrs даёт доступ к связям через awaitable_attrs в асинхронных сессиях
+Base = declarative_base(cls=AsyncAttrs)
 
 # Определение констант для Enum полей
 TRANSMISSION_TYPES = ["АКП", "МКП"]
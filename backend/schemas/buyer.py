@@ -23,4 +23,5 @@ class Buyer(Base):
     max_price = Column(Float)
 
     favorites = relationship("Favorite", back_populates="buyer", cascade="all, delete")
-    deals = relationship("Deal", back_populates="buyer", cascade="all, delete")
\ No newline at end of file
+    deals = relationship("Deal", back_populates="buyer", cascade="all, delete")
+    notifications = relationship("Notification", back_populates="buyer", cascade="all, delete")
\ No newline at end of file
@@ -1,10 +1,25 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, JSON, ForeignKey, Index, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
 from .base import Base, TRANSMISSION_TYPES, CONDITION_TYPES
 
 class Car(Base):
     __tablename__ = "cars"
+    __table_args__ = (
+        # Триграммные GIN-индексы для поиска подстроки ILIKE '%...%' (PostgreSQL)
+        Index("ix_cars_brand_trgm", "brand", postgresql_using="gin", postgresql_ops={"brand": "gin_trgm_ops"}),
+        Index("ix_cars_model_trgm", "model", postgresql_using="gin", postgresql_ops={"model": "gin_trgm_ops"}),
+        # Диапазонные фильтры и keyset-пагинация по (ключ сортировки, id)
+        Index("ix_cars_price_id", "price", "id"),
+        Index("ix_cars_year_id", "year", "id"),
+        Index("ix_cars_mileage", "mileage"),
+        # Фильтры на равенство с последующим диапазоном по цене
+        Index("ix_cars_condition_transmission_price", "condition", "transmission", "price"),
+        Index("ix_cars_status", "status"),
+        # GIN-индекс для фильтра по содержимому features (оператор @>)
+        Index("ix_cars_features", "features", postgresql_using="gin", postgresql_ops={"features": "jsonb_path_ops"}),
+    )
 
     id = Column(Integer, primary_key=True)
     brand = Column(String)
@@ -14,15 +29,41 @@ class Car(Base):
     transmission = Column(String)     # АКП / МКП
     condition = Column(String)        # new / used
     mileage = Column(Float)
-    features = Column(Text)
+    features = Column(JSON().with_variant(JSONB(), "postgresql"))  # список строк
     price = Column(Float)
     status = Column(String, default="active")
 
-    seller_id = Column(Integer, ForeignKey("sellers.id"))
-    store_id = Column(Integer, ForeignKey("stores.id"))
+    seller_id = Column(Integer, ForeignKey("sellers.id"), index=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), index=True)
 
     seller = relationship("Seller", back_populates="cars")
     store = relationship("Store", back_populates="cars")
 
     favorites = relationship("Favorite", back_populates="car", cascade="all, delete")
-    deals = relationship("Deal", back_populates="car", cascade="all, delete")
\ No newline at end of file
+    deals = relationship("Deal", back_populates="car", cascade="all, delete")
+
+
+# Расширение pg_trgm нужно триграммным индексам при создании таблиц через create_all
+event.listen(
+    Car.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+# Полнотекстовый поиск (PostgreSQL): генерируемая колонка search_vector по марке,
+# модели (вес A) и опциям (вес B) с GIN-индексом. В ORM-модели колонка не описана,
+# т.к. существует только в PostgreSQL; запросы обращаются к ней по имени
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('simple', coalesce(brand, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(model, '')), 'A') || "
+    "setweight(jsonb_to_tsvector('simple', coalesce(features, '[]'::jsonb), '[\"string\"]'), 'B')"
+)
+
+event.listen(
+    Car.__table__,
+    "after_create",
+    DDL(
+        f"ALTER TABLE cars ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED; "
+        "CREATE INDEX ix_cars_search_vector ON cars USING gin (search_vector)"
+    ).execute_if(dialect="postgresql"),
+)
\ No newline at end of file
@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Integer, String, Float, JSON, Index, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .base import Base
+
+class CarListing(Base):
+    """Денормализованная проекция каталога для чтения (см. backend/read_model.py)
+
+    Строка повторяет ответ GET /cars: поля автомобиля, имя продавца и название
+    магазина, поэтому список читается из одной таблицы без соединений.
+    """
+    __tablename__ = "car_listings"
+    __table_args__ = (
+        Index("ix_car_listings_brand_trgm", "brand", postgresql_using="gin", postgresql_ops={"brand": "gin_trgm_ops"}),
+        Index("ix_car_listings_model_trgm", "model", postgresql_using="gin", postgresql_ops={"model": "gin_trgm_ops"}),
+        Index("ix_car_listings_price_id", "price", "id"),
+        Index("ix_car_listings_year_id", "year", "id"),
+        Index("ix_car_listings_mileage", "mileage"),
+        Index("ix_car_listings_condition_transmission_price", "condition", "transmission", "price"),
+        Index("ix_car_listings_status", "status"),
+        Index("ix_car_listings_features", "features", postgresql_using="gin", postgresql_ops={"features": "jsonb_path_ops"}),
+    )
+
+    # id совпадает с cars.id
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    brand = Column(String)
+    model = Column(String)
+    year = Column(Integer)
+    power = Column(Integer)
+    transmission = Column(String)
+    condition = Column(String)
+    mileage = Column(Float)
+    features = Column(JSON().with_variant(JSONB(), "postgresql"))
+    price = Column(Float)
+    status = Column(String)
+
+    seller_id = Column(Integer, index=True)
+    seller_name = Column(String)
+    store_id = Column(Integer, index=True)
+    store_name = Column(String)
+
+
+# Таблица может создаваться раньше cars, поэтому расширение pg_trgm подключается и здесь
+event.listen(
+    CarListing.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
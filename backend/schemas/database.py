@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from sqlalchemy.dialects import postgresql, sqlite
 import os
+import threading
+import time
+from uuid import uuid4
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения
@@ -14,21 +19,135 @@ DB_HOST = os.environ.get("DB_HOST", "localhost")
 DB_PORT = os.environ.get("DB_PORT", "5432")
 DB_NAME = os.environ.get("DB_NAME", "car_dealership")
 
-# Формируем строку подключения
+# Настройки пула соединений
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+# Режим PgBouncer (transaction pooling): без собственного пула и без кэша подготовленных выражений
+DB_PGBOUNCER = os.environ.get("DB_PGBOUNCER", "false").lower() == "true"
+
+# Формируем строки подключения: синхронную (миграции, создание таблиц)
+# и асинхронную (обработчики запросов)
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+SQLALCHEMY_ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+
+class PoolMetrics:
+    """Счетчики выдачи соединений из пула"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record(self, wait_time: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.wait_time_total += wait_time
+                self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "avg_wait_ms": self.wait_time_total / self.checkouts * 1000 if self.checkouts else 0,
+                "max_wait_ms": self.wait_time_max * 1000,
+            }
+
+
+pool_metrics = PoolMetrics()
+
 
-# Создаем подключение к базе данных
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий время ожидания соединения и число таймаутов"""
+
+    def connect(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.record(time.perf_counter() - started_at, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - started_at)
+        return connection
+
+
+def _async_engine_options() -> dict:
+    """Параметры асинхронного движка из переменных окружения"""
+    if DB_PGBOUNCER:
+        return {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                # Уникальные имена, чтобы выражения разных клиентов PgBouncer не конфликтовали
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            },
+        }
+    return {
+        "poolclass": MeteredAsyncQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# Синхронное подключение к базе данных
+engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=DB_POOL_PRE_PING)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронное подключение: запросы не блокируют цикл событий uvicorn.
+# expire_on_commit=False — после commit атрибуты объектов остаются доступными
+# без повторной загрузки (неявный ленивый SELECT в async-контексте невозможен)
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, **_async_engine_options())
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+def pool_status() -> dict:
+    """Состояние пула асинхронного движка для метрик"""
+    pool = async_engine.pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "pgbouncer_mode": DB_PGBOUNCER,
+    }
+    # NullPool не хранит соединения, поэтому размеров у него нет
+    if hasattr(pool, "checkedout"):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": DB_MAX_OVERFLOW,
+        })
+    status.update(pool_metrics.snapshot())
+    return status
+
+def dialect_insert(dialect_name: str, table):
+    """INSERT с поддержкой ON CONFLICT для текущей СУБД (PostgreSQL или SQLite в тестах)"""
+    if dialect_name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
 # Dependency для FastAPI
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Эта строка закомментирована, т.к. создание таблиц происходит в main.py
 # from .base import Base
-# Base.metadata.create_all(bind=engine)
\ No newline at end of file
+# Base.metadata.create_all(bind=engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Enum, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -6,6 +6,19 @@ from .base import Base, DEAL_STATUSES
 
 class Deal(Base):
     __tablename__ = "deals"
+    __table_args__ = (
+        # История сделок покупателя и сделок по автомобилям продавца
+        # с keyset-пагинацией по дате сделки
+        Index("ix_deals_buyer_date", "buyer_id", "deal_date", "id"),
+        Index("ix_deals_car_date", "car_id", "deal_date", "id"),
+        # Не более одной ожидающей заявки покупателя на автомобиль
+        Index(
+            "uq_deals_pending_car_buyer", "car_id", "buyer_id",
+            unique=True,
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     buyer_id = Column(Integer, ForeignKey("buyers.id"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -6,10 +6,17 @@ from .base import Base
 
 class Favorite(Base):
     __tablename__ = "favorites"
+    __table_args__ = (
+        # Один автомобиль в избранном покупателя не более одного раза;
+        # индекс ограничения обслуживает и выборки по buyer_id
+        UniqueConstraint("buyer_id", "car_id", name="uq_favorites_buyer_car"),
+        # Список избранного покупателя с keyset-пагинацией по дате добавления
+        Index("ix_favorites_buyer_added_at", "buyer_id", "added_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     buyer_id = Column(Integer, ForeignKey("buyers.id"))
-    car_id = Column(Integer, ForeignKey("cars.id"))
+    car_id = Column(Integer, ForeignKey("cars.id"), index=True)
     added_at = Column(DateTime, default=datetime.utcnow)
 
     buyer = relationship("Buyer", back_populates="favorites")
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, DateTime, JSON
+from datetime import datetime
+
+from .base import Base
+
+class MarketSnapshot(Base):
+    __tablename__ = "market_snapshots"
+
+    # Хранится одна строка (id = 1) с последним рассчитанным анализом рынка
+    id = Column(Integer, primary_key=True)
+    data = Column(JSON, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
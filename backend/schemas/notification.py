@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from .base import Base
+
+class Notification(Base):
+    __tablename__ = "notifications"
+    __table_args__ = (
+        # Лента уведомлений покупателя, новые первыми
+        Index("ix_notifications_buyer_id_id", "buyer_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    buyer_id = Column(Integer, ForeignKey("buyers.id"), nullable=False)
+    kind = Column(String, nullable=False)      # new_cars — новые автомобили под предпочтения
+    car_ids = Column(JSON, nullable=False)     # список id автомобилей
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    read_at = Column(DateTime, nullable=True)
+
+    buyer = relationship("Buyer", back_populates="notifications")
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, text
+from datetime import datetime
+
+from .base import Base
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Выборка неотправленных событий по порядку записи
+        Index(
+            "ix_outbox_events_pending", "id",
+            postgresql_where=text("processed_at IS NULL"),
+            sqlite_where=text("processed_at IS NULL"),
+        ),
+    )
+
+    # Событие записывается в той же транзакции, что и изменение данных,
+    # и доставляется потребителям фоновым диспетчером (backend.outbox)
+    id = Column(Integer, primary_key=True)
+    event_type = Column(String, nullable=False)   # например, car.created
+    aggregate_id = Column(Integer, nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String, nullable=True)
@@ -1,22 +1,42 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool
 import os
 from datetime import datetime
-import json
 
 from backend.schemas.base import Base
 from backend.schemas.database import get_db
 from backend.main import app
 from backend.schemas import Buyer, Seller, Car, Store, Deal, Favorite
-from backend.auth import get_password_hash
+from backend.auth import get_password_hash, clear_auth_caches
+from backend.matching import buyer_matcher
+from backend.response_cache import response_cache, MemoryCacheBackend
+from backend.outbox import outbox_dispatcher
 
 # Создание тестовой БД
 TEST_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(TEST_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронное подключение к той же БД для обработчиков приложения.
+# NullPool: TestClient создаёт новый цикл событий на каждый тест
+TEST_ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+async_engine = create_async_engine(TEST_ASYNC_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Диспетчер outbox работает с тестовой БД; в тестах он не запускается в фоне,
+# события доставляются явным вызовом dispatch_once()
+outbox_dispatcher.session_factory = TestingAsyncSessionLocal
+outbox_dispatcher.interval = 0
+
 @pytest.fixture(scope="function")
 def db_session():
     # Создание таблиц в тестовой БД
@@ -33,14 +53,16 @@ def db_session():
 @pytest.fixture(scope="function")
 def client(db_session):
     # Переопределяем зависимость для получения сессии БД
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
 
     # Подменяем функцию get_db на нашу тестовую
     app.dependency_overrides[get_db] = override_get_db
+    # Индекс предпочтений и кэши живут в процессе — сбрасываем их между тестами
+    buyer_matcher.reset()
+    clear_auth_caches()
+    response_cache.set_backend(MemoryCacheBackend())
 
     # Создаем тестовый клиент
     with TestClient(app) as client:
@@ -49,6 +71,18 @@ def client(db_session):
     # Удаляем переопределение зависимости
     app.dependency_overrides = {}
 
+@pytest.fixture(scope="function")
+def query_counter():
+    """Фикстура для подсчета SQL-запросов, выполненных приложением"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
 @pytest.fixture(scope="function")
 def test_seller(db_session):
     """Фикстура для создания тестового продавца"""
@@ -99,7 +133,7 @@ def test_store(db_session):
 @pytest.fixture(scope="function")
 def test_car(db_session, test_seller, test_store):
     """Фикстура для создания тестового автомобиля"""
-    features = json.dumps(["leather seats", "navigation", "bluetooth"])
+    features = ["leather seats", "navigation", "bluetooth"]
 
     car = Car(
         brand="Toyota",
@@ -1,6 +1,9 @@
 import pytest
 from fastapi.testclient import TestClient
 
+from backend.schemas import Seller
+from backend.auth import pwd_context
+
 def test_register_buyer(client):
     """Тест регистрации нового покупателя"""
     response = client.post(
@@ -96,4 +99,22 @@ def test_login_invalid_credentials(client):
         }
     )
     assert response.status_code == 401
-    assert response.json()["detail"] == "Неверный email или пароль"
\ No newline at end of file
+    assert response.json()["detail"] == "Неверный email или пароль"
+
+def test_login_rehashes_outdated_password_hash(client, db_session):
+    """Тест: при входе хеш с устаревшей стоимостью bcrypt пересчитывается"""
+    seller = Seller(
+        email="legacy@test.com",
+        password_hash=pwd_context.copy(bcrypt__rounds=4).hash("password"),
+        full_name="Legacy Seller",
+        contact_info="000"
+    )
+    db_session.add(seller)
+    db_session.commit()
+
+    response = client.post("/auth/token", data={"username": seller.email, "password": "password"})
+    assert response.status_code == 200
+
+    db_session.refresh(seller)
+    assert not pwd_context.needs_update(seller.password_hash)
+    assert pwd_context.verify("password", seller.password_hash)
@@ -1,5 +1,11 @@
 import pytest
 import json
+import csv
+import io
+
+from backend.schemas import Car, Seller, Store
+from backend.response_cache import response_cache, MemoryCacheBackend
+from backend import read_model
 
 def test_get_all_cars(client, test_car):
     """Тест получения списка всех автомобилей"""
@@ -94,8 +100,7 @@ def test_update_car(client, seller_auth_header, test_car):
     """Тест обновления информации об автомобиле"""
     updated_price = test_car.price + 5000
 
-    # Преобразуем features из JSON-строки в список
-    features = json.loads(test_car.features) if test_car.features else []
+    features = test_car.features or []
 
     response = client.put(
         f"/cars/{test_car.id}",
@@ -147,4 +152,477 @@ def test_delete_car(client, seller_auth_header, test_car, db_session):
 
     # Проверяем, что автомобиль больше не доступен
     response = client.get(f"/cars/{test_car.id}")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_get_all_cars_query_count_constant(client, db_session, test_car, query_counter):
+    """Тест: число запросов при получении списка не зависит от размера страницы"""
+    response = client.get("/cars")
+    assert response.status_code == 200
+    single_page_queries = len(query_counter)
+
+    # Добавляем автомобили с разными продавцами и магазинами
+    for i in range(5):
+        seller = Seller(
+            email=f"seller{i}@test.com",
+            password_hash="hash",
+            full_name=f"Seller {i}",
+            contact_info="000"
+        )
+        store = Store(name=f"Store {i}", address=f"Street {i}")
+        db_session.add_all([seller, store])
+        db_session.flush()
+        db_session.add(Car(
+            brand="Honda",
+            model="Civic",
+            year=2019,
+            power=150,
+            transmission="automatic",
+            condition="used",
+            mileage=20000,
+            price=15000 + i,
+            seller_id=seller.id,
+            store_id=store.id
+        ))
+    db_session.commit()
+    # Строки добавлены в обход API, поэтому кэш ответов сбрасываем вручную
+    response_cache.set_backend(MemoryCacheBackend())
+
+    query_counter.clear()
+    response = client.get("/cars")
+    assert response.status_code == 200
+    cars = response.json()
+    assert len(cars) == 6
+    assert all(car["seller_name"] and car["store_name"] for car in cars)
+    assert len(query_counter) == single_page_queries
+
+def test_get_all_cars_cursor_pagination(client, db_session, test_car):
+    """Тест курсорной пагинации каталога с сортировкой по цене"""
+    for price in (20000, 30000, 40000):
+        db_session.add(Car(
+            brand="Honda",
+            model="Accord",
+            year=2021,
+            power=200,
+            transmission="automatic",
+            condition="new",
+            mileage=0,
+            price=price,
+            seller_id=test_car.seller_id,
+            store_id=test_car.store_id
+        ))
+    db_session.commit()
+
+    seen = []
+    params = {"pagination": "cursor", "sort_by": "price", "limit": 2}
+    while True:
+        response = client.get("/cars", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 2
+        seen.extend((car["price"], car["id"]) for car in page["items"])
+        if not page["next_cursor"]:
+            break
+        params["cursor"] = page["next_cursor"]
+
+    # Все автомобили получены ровно один раз и в порядке (цена, id)
+    assert len(seen) == 4
+    assert seen == sorted(seen)
+
+def test_get_all_cars_cursor_pagination_null_sort_key(client, db_session, test_car):
+    """Тест курсорной пагинации по цене, когда у части автомобилей цена не задана"""
+    for price in (None, 20000, None):
+        db_session.add(Car(
+            brand="Honda",
+            model="Accord",
+            year=2021,
+            price=price,
+            seller_id=test_car.seller_id,
+            store_id=test_car.store_id
+        ))
+    db_session.commit()
+
+    for sort_order in ("asc", "desc"):
+        seen = []
+        params = {"pagination": "cursor", "sort_by": "price", "sort_order": sort_order, "limit": 1}
+        while True:
+            page = client.get("/cars", params=params).json()
+            seen.extend((car["price"], car["id"]) for car in page["items"])
+            if not page["next_cursor"]:
+                break
+            params["cursor"] = page["next_cursor"]
+
+        # Все автомобили ровно один раз, без цены — в конце
+        assert len(seen) == 4
+        assert [price for price, _ in seen[2:]] == [None, None]
+        assert seen[2][1] < seen[3][1] if sort_order == "asc" else seen[2][1] > seen[3][1]
+        expected_prices = [20000, 30000] if sort_order == "asc" else [30000, 20000]
+        assert [price for price, _ in seen[:2]] == expected_prices
+
+def test_get_all_cars_invalid_limit(client, test_car):
+    """Тест: размер страницы проверяется до выполнения запроса"""
+    for params in ({"pagination": "cursor", "limit": 0}, {"limit": -1}, {"limit": 100000}, {"skip": -1}):
+        response = client.get("/cars", params=params)
+        assert response.status_code == 422
+
+def test_get_all_cars_invalid_cursor(client, db_session, test_car):
+    """Тест курсора, выданного для другой сортировки, и поврежденного курсора"""
+    db_session.add(Car(
+        brand="Honda",
+        model="Accord",
+        year=2021,
+        price=20000,
+        seller_id=test_car.seller_id,
+        store_id=test_car.store_id
+    ))
+    db_session.commit()
+
+    response = client.get("/cars", params={"pagination": "cursor", "sort_by": "year", "limit": 1})
+    cursor = response.json()["next_cursor"]
+    assert cursor
+
+    response = client.get("/cars", params={"pagination": "cursor", "sort_by": "price", "cursor": cursor})
+    assert response.status_code == 400
+
+    response = client.get("/cars", params={"pagination": "cursor", "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_get_all_cars_features_filter(client, db_session, test_car):
+    """Тест фильтрации автомобилей по опциям"""
+    db_session.add(Car(
+        brand="Lada",
+        model="Vesta",
+        year=2020,
+        price=10000,
+        features=["bluetooth"],
+        seller_id=test_car.seller_id,
+        store_id=test_car.store_id
+    ))
+    db_session.commit()
+
+    response = client.get("/cars", params={"features": ["navigation", "bluetooth"]})
+    assert response.status_code == 200
+    cars = response.json()
+    assert [car["id"] for car in cars] == [test_car.id]
+    assert cars[0]["features"] == ["leather seats", "navigation", "bluetooth"]
+
+    response = client.get("/cars", params={"features": "bluetooth"})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+def test_get_all_cars_response_cache(client, test_car, query_counter):
+    """Тест: повторный запрос отдается из кэша, If-None-Match дает 304"""
+    response = client.get("/cars?brand=Toyota")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    query_counter.clear()
+    response = client.get("/cars?brand=Toyota")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert query_counter == []
+
+    response = client.get("/cars?brand=Toyota", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+def test_car_write_invalidates_response_cache(client, seller_auth_header, test_car):
+    """Тест: изменение автомобиля через API делает кэш устаревшим"""
+    response = client.get(f"/cars/{test_car.id}")
+    etag = response.headers["ETag"]
+
+    response = client.patch(
+        f"/cars/{test_car.id}/status",
+        json={"status": "sold"},
+        headers=seller_auth_header
+    )
+    assert response.status_code == 200
+
+    response = client.get(f"/cars/{test_car.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["status"] == "sold"
+    assert response.headers["ETag"] != etag
+
+def test_get_all_cars_favorites_overlay(client, test_favorite, buyer_auth_header):
+    """Тест: отметка избранного накладывается на общий закэшированный ответ"""
+    anonymous = client.get("/cars")
+    assert anonymous.json()[0]["is_favorite"] is False
+
+    personal = client.get("/cars", headers=buyer_auth_header)
+    assert personal.json()[0]["is_favorite"] is True
+    assert personal.headers["ETag"] != anonymous.headers["ETag"]
+
+    response = client.get("/cars", headers={**buyer_auth_header, "If-None-Match": anonymous.headers["ETag"]})
+    assert response.status_code == 200
+
+def test_export_cars_ndjson(client, db_session, test_car):
+    """Тест потоковой выгрузки каталога в NDJSON с фильтрами списка"""
+    db_session.add(Car(
+        brand="Honda",
+        model="Civic",
+        year=2019,
+        power=150,
+        transmission="manual",
+        condition="used",
+        mileage=20000,
+        price=15000,
+        seller_id=test_car.seller_id
+    ))
+    db_session.commit()
+
+    response = client.get("/cars/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["brand"] for row in rows] == ["Toyota", "Honda"]
+    assert rows[0]["seller_name"] == "Test Seller"
+    assert rows[0]["store_name"] == "Test Store"
+    assert rows[0]["features"] == test_car.features
+    assert rows[1]["store_name"] is None
+
+    response = client.get("/cars/export?transmission=manual")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["brand"] for row in rows] == ["Honda"]
+
+def test_export_cars_csv(client, test_car):
+    """Тест потоковой выгрузки каталога в CSV"""
+    response = client.get("/cars/export?format=csv&brand=Toyota")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    header, row = list(csv.reader(io.StringIO(response.text)))
+    assert header[:3] == ["id", "brand", "model"]
+    assert row[1] == "Toyota"
+    assert row[header.index("features")] == "leather seats;navigation;bluetooth"
+
+    response = client.get("/cars/export?format=xml")
+    assert response.status_code == 400
+
+def test_add_cars_bulk_json(client, seller_auth_header, test_store, query_counter):
+    """Тест массового добавления автомобилей JSON-массивом с ошибками в строках"""
+    car = {
+        "brand": "Honda",
+        "model": "Civic",
+        "year": 2021,
+        "power": 150,
+        "transmission": "automatic",
+        "condition": "new",
+        "mileage": 1000,
+        "features": ["camera"],
+        "price": 25000,
+        "store_id": test_store.id
+    }
+    rows = [car, {**car, "model": "Accord"}, {**car, "year": "old"}, {**car, "store_id": 9999}, "car"]
+
+    query_counter.clear()
+    response = client.post("/cars/bulk", json=rows, headers=seller_auth_header)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created"] == 2
+    assert len(result["ids"]) == 2
+    assert [error["row"] for error in result["errors"]] == [2, 3, 4]
+    assert result["errors"][1]["errors"] == ["Магазин не найден"]
+    # Магазины всех строк проверяются одним запросом
+    assert len([s for s in query_counter if "FROM stores" in s]) == 1
+
+    models = [c["model"] for c in client.get("/cars").json()]
+    assert models == ["Civic", "Accord"]
+
+def test_add_cars_bulk_csv_upload(client, seller_auth_header, test_store):
+    """Тест массового добавления автомобилей из CSV-файла"""
+    data = (
+        "brand,model,year,power,transmission,condition,mileage,features,price,store_id\n"
+        f"Honda,Civic,2021,150,automatic,new,1000,camera;bluetooth,25000,{test_store.id}\n"
+        f"Honda,Jazz,,90,manual,used,50000,,9000,{test_store.id}\n"
+    )
+    response = client.post(
+        "/cars/bulk",
+        files={"file": ("cars.csv", data, "text/csv")},
+        headers=seller_auth_header
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created"] == 1
+    assert result["errors"][0]["row"] == 1
+
+    car = client.get(f"/cars/{result['ids'][0]}").json()
+    assert car["features"] == ["camera", "bluetooth"]
+
+def test_add_cars_bulk_ndjson(client, seller_auth_header, test_store):
+    """Тест массового добавления автомобилей в формате NDJSON"""
+    line = json.dumps({
+        "brand": "Honda", "model": "Civic", "year": 2021, "power": 150,
+        "transmission": "automatic", "condition": "new", "mileage": 1000,
+        "price": 25000, "store_id": test_store.id
+    })
+    response = client.post(
+        "/cars/bulk",
+        content=f"{line}\n{line}\n",
+        headers={**seller_auth_header, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+
+    response = client.post(
+        "/cars/bulk",
+        content="{not json}\n",
+        headers={**seller_auth_header, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 400
+
+def test_update_cars_status_bulk(client, db_session, seller_auth_header, test_car):
+    """Тест массового обновления статуса: чужие и несуществующие id — в ошибках"""
+    other_seller = Seller(email="other@test.com", password_hash="hash", full_name="Other", contact_info="000")
+    db_session.add(other_seller)
+    db_session.flush()
+    own_car = Car(brand="Honda", model="Civic", year=2019, power=150, transmission="manual",
+                  condition="used", mileage=20000, price=15000, seller_id=test_car.seller_id)
+    foreign_car = Car(brand="Kia", model="Rio", year=2018, power=100, transmission="manual",
+                      condition="used", mileage=40000, price=9000, seller_id=other_seller.id)
+    db_session.add_all([own_car, foreign_car])
+    db_session.commit()
+
+    response = client.patch(
+        "/cars/bulk/status",
+        json={"car_ids": [test_car.id, own_car.id, foreign_car.id, 9999], "status": "sold"},
+        headers=seller_auth_header
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["updated"] == [test_car.id, own_car.id]
+    assert [error["car_id"] for error in result["errors"]] == [foreign_car.id, 9999]
+
+    statuses = {car["id"]: car["status"] for car in client.get("/cars").json()}
+    assert statuses == {test_car.id: "sold", own_car.id: "sold", foreign_car.id: "active"}
+
+    response = client.patch(
+        "/cars/bulk/status",
+        json={"car_ids": [test_car.id], "status": "lost"},
+        headers=seller_auth_header
+    )
+    assert response.status_code == 400
+
+def test_delete_cars_bulk(client, db_session, seller_auth_header, test_deal):
+    """Тест массового удаления: автомобиль с активной сделкой не удаляется"""
+    free_car = Car(brand="Honda", model="Civic", year=2019, power=150, transmission="manual",
+                   condition="used", mileage=20000, price=15000, seller_id=test_deal.car.seller_id)
+    db_session.add(free_car)
+    db_session.commit()
+
+    response = client.post(
+        "/cars/bulk/delete",
+        json={"car_ids": [test_deal.car_id, free_car.id]},
+        headers=seller_auth_header
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["deleted"] == [free_car.id]
+    assert result["errors"] == [{"car_id": test_deal.car_id, "error": "Нельзя удалить автомобиль с активными сделками"}]
+    assert client.get(f"/cars/{free_car.id}").status_code == 404
+    assert client.get(f"/cars/{test_deal.car_id}").status_code == 200
+
+def test_car_read_model(client, monkeypatch, seller_auth_header, test_store, query_counter):
+    """Тест денормализованной проекции: синхронизация при записи и чтение каталога из нее"""
+    monkeypatch.setattr(read_model, "CAR_READ_MODEL", True)
+    response = client.post(
+        "/cars",
+        json={
+            "brand": "Honda",
+            "model": "Civic",
+            "year": 2021,
+            "power": 150,
+            "transmission": "automatic",
+            "condition": "new",
+            "mileage": 1000,
+            "features": ["camera"],
+            "price": 25000,
+            "store_id": test_store.id
+        },
+        headers=seller_auth_header
+    )
+    car_id = response.json()["id"]
+
+    query_counter.clear()
+    cars = client.get("/cars?features=camera").json()
+    assert [(car["id"], car["seller_name"], car["store_name"]) for car in cars] == [(car_id, "Test Seller", "Test Store")]
+    assert len(query_counter) == 1
+    assert "FROM car_listings" in query_counter[0]
+    assert "JOIN" not in query_counter[0]
+
+    client.patch(f"/cars/{car_id}/status", json={"status": "sold"}, headers=seller_auth_header)
+    client.put("/users/profile", json={"full_name": "Renamed Seller"}, headers=seller_auth_header)
+    car = client.get("/cars").json()[0]
+    assert (car["status"], car["seller_name"]) == ("sold", "Renamed Seller")
+    assert client.get("/queries/new-cars").json()[0]["seller_name"] == "Renamed Seller"
+
+    client.delete(f"/cars/{car_id}", headers=seller_auth_header)
+    assert client.get("/cars").json() == []
+
+def test_search_cars(client, db_session, test_car):
+    """Тест полнотекстового поиска по марке, модели и опциям с фильтрами"""
+    db_session.add(Car(brand="Honda", model="Civic", year=2019, power=150, transmission="manual",
+                       condition="used", mileage=20000, features=["navigation"], price=15000,
+                       seller_id=test_car.seller_id))
+    db_session.commit()
+
+    response = client.get("/cars/search?q=toyota cam")
+    assert response.status_code == 200
+    assert [car["id"] for car in response.json()] == [test_car.id]
+    assert "rank" in response.json()[0]
+    assert response.json()[0]["seller_name"] == "Test Seller"
+
+    response = client.get("/cars/search?q=navigation")
+    assert [car["brand"] for car in response.json()] == ["Toyota", "Honda"]
+
+    response = client.get("/cars/search?q=navigation&max_price=20000")
+    assert [car["brand"] for car in response.json()] == ["Honda"]
+
+    response = client.get("/cars/search?q=%20%26!")
+    assert response.status_code == 400
+
+def test_search_cars_invalid_limit(client, test_car):
+    """Тест: размер страницы поиска проверяется до выполнения запроса"""
+    for params in ({"limit": 0}, {"limit": -1}, {"limit": 100000}, {"skip": -1}):
+        response = client.get("/cars/search", params={"q": "toyota", **params})
+        assert response.status_code == 422
+
+def test_get_car_facets(client, db_session, test_car, query_counter):
+    """Тест фасетов каталога: все счетчики одним запросом и с учетом фильтров"""
+    db_session.add_all([
+        Car(brand="Honda", model="Civic", year=2016, power=150, transmission="manual",
+            condition="used", mileage=20000, price=15000, seller_id=test_car.seller_id),
+        Car(brand="Honda", model="Jazz", year=2012, power=90, transmission="manual",
+            condition="used", mileage=90000, price=120000, seller_id=test_car.seller_id),
+    ])
+    db_session.commit()
+
+    query_counter.clear()
+    response = client.get("/cars/facets")
+    assert response.status_code == 200
+    assert len(query_counter) == 1
+    facets = response.json()
+    assert facets["total"] == 3
+    assert facets["brand"] == [{"value": "Honda", "count": 2}, {"value": "Toyota", "count": 1}]
+    assert facets["transmission"] == [{"value": "manual", "count": 2}, {"value": "automatic", "count": 1}]
+    assert facets["year"] == [
+        {"from": 2010, "to": 2014, "count": 1},
+        {"from": 2015, "to": 2019, "count": 1},
+        {"from": 2020, "to": 2024, "count": 1},
+    ]
+    assert facets["price"] == [
+        {"from": 10000, "to": 20000, "count": 1},
+        {"from": 30000, "to": 50000, "count": 1},
+        {"from": 100000, "to": None, "count": 1},
+    ]
+
+    facets = client.get("/cars/facets?brand=Honda").json()
+    assert facets["total"] == 2
+    assert facets["condition"] == [{"value": "used", "count": 2}]
+
+def test_get_car_facets_null_price(client, db_session, test_car):
+    """Тест: автомобиль без цены не попадает в ценовые диапазоны"""
+    db_session.add(Car(brand="Lada", model="Niva", year=2021, seller_id=test_car.seller_id))
+    db_session.commit()
+
+    facets = client.get("/cars/facets").json()
+    assert facets["total"] == 2
+    assert facets["price"] == [{"from": 30000, "to": 50000, "count": 1}]
@@ -1,4 +1,10 @@
 import pytest
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from backend.schemas import Deal, Buyer, Seller, Car
+from backend.routers.deals import deal_insert_statement
 
 def test_create_deal(client, test_car, buyer_auth_header):
     """Тест создания новой сделки"""
@@ -19,9 +25,47 @@ def test_create_deal_duplicate(client, test_deal, buyer_auth_header):
         params={"car_id": test_deal.car_id},
         headers=buyer_auth_header
     )
-    assert response.status_code == 400
+    assert response.status_code == 409
     assert response.json()["detail"] == "У вас уже есть заявка на этот автомобиль"
 
+def test_create_deal_single_statement(client, test_car, buyer_auth_header, query_counter):
+    """Тест: заявка создается одной вставкой с ценой автомобиля и ON CONFLICT"""
+    query_counter.clear()
+    response = client.post("/deals", params={"car_id": test_car.id}, headers=buyer_auth_header)
+    assert response.status_code == 200
+    deal_queries = [s for s in query_counter if "deals" in s]
+    assert len(deal_queries) == 1
+    assert "ON CONFLICT" in deal_queries[0]
+    assert "WHERE status = 'pending'" in deal_queries[0]
+
+    response = client.get("/deals/my", headers=buyer_auth_header)
+    assert response.json()[0]["price"] == test_car.price
+
+def test_create_deal_statement_postgres_enum():
+    """Тест: в PostgreSQL статус заявки приводится к перечислению deal_status, а не к VARCHAR"""
+    sql = str(deal_insert_statement("postgresql", 1, 1).compile(dialect=asyncpg.dialect()))
+    inserted_values = sql.split("FROM cars")[0]
+    assert "::deal_status" in inserted_values
+    assert "VARCHAR" not in inserted_values
+
+def test_create_deal_after_rejected(client, db_session, test_deal, buyer_auth_header):
+    """Тест: отклоненная заявка не мешает подать новую"""
+    test_deal.status = "rejected"
+    db_session.commit()
+    response = client.post("/deals", params={"car_id": test_deal.car_id}, headers=buyer_auth_header)
+    assert response.status_code == 200
+    assert response.json()["deal_id"] != test_deal.id
+
+def test_create_deal_car_not_active(client, db_session, test_car, buyer_auth_header):
+    """Тест: на проданный или снятый с продажи автомобиль заявку подать нельзя"""
+    for status in ("sold", "inactive"):
+        test_car.status = status
+        db_session.commit()
+        response = client.post("/deals", params={"car_id": test_car.id}, headers=buyer_auth_header)
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Автомобиль недоступен для покупки"
+    assert db_session.query(Deal).count() == 0
+
 def test_create_deal_car_not_found(client, buyer_auth_header):
     """Тест создания сделки на несуществующий автомобиль"""
     response = client.post(
@@ -89,6 +133,58 @@ def test_update_deal_status_invalid(client, test_deal, seller_auth_header):
     assert response.status_code == 400
     assert "Недопустимый статус" in response.json()["detail"]
 
+def test_complete_deal_marks_car_sold(client, db_session, test_deal, test_car, seller_auth_header):
+    """Тест: завершение сделки продает автомобиль и отклоняет конкурирующие заявки"""
+    other_buyer = Buyer(email="other@test.com", password_hash="x", full_name="Other Buyer")
+    db_session.add(other_buyer)
+    db_session.flush()
+    competing = Deal(buyer_id=other_buyer.id, car_id=test_car.id, price=test_car.price, status="pending")
+    db_session.add(competing)
+    db_session.commit()
+
+    assert len(client.get("/cars", params={"status": "active"}).json()) == 1
+
+    # Завершить можно только одобренную сделку
+    response = client.put(f"/deals/{test_deal.id}/status", params={"status": "completed"}, headers=seller_auth_header)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Недопустимый переход статуса: pending -> completed"
+
+    client.put(f"/deals/{test_deal.id}/status", params={"status": "approved"}, headers=seller_auth_header)
+    response = client.put(f"/deals/{test_deal.id}/status", params={"status": "completed"}, headers=seller_auth_header)
+    assert response.status_code == 200
+    assert response.json()["rejected_deal_ids"] == [competing.id]
+
+    statuses = {deal["id"]: deal["status"] for deal in client.get("/deals/my", headers=seller_auth_header).json()}
+    assert statuses == {test_deal.id: "completed", competing.id: "rejected"}
+    assert client.get(f"/cars/{test_car.id}").json()["status"] == "sold"
+    assert client.get("/cars", params={"status": "active"}).json() == []
+
+    # Сделку по проданному автомобилю нельзя одобрить
+    response = client.put(f"/deals/{competing.id}/status", params={"status": "approved"}, headers=seller_auth_header)
+    assert response.status_code == 409
+
+def test_update_deal_status_foreign_car(client, db_session, test_buyer, seller_auth_header, query_counter):
+    """Тест: продавец не может менять сделки по чужим автомобилям"""
+    other_seller = Seller(email="other-seller@test.com", password_hash="x", full_name="Other Seller")
+    db_session.add(other_seller)
+    db_session.flush()
+    car = Car(brand="Kia", model="Rio", year=2018, price=9000, status="active", seller_id=other_seller.id)
+    db_session.add(car)
+    db_session.flush()
+    deal = Deal(buyer_id=test_buyer.id, car_id=car.id, price=car.price, status="pending")
+    db_session.add(deal)
+    db_session.commit()
+
+    query_counter.clear()
+    response = client.put(f"/deals/{deal.id}/status", params={"status": "approved"}, headers=seller_auth_header)
+    assert response.status_code == 403
+    # Проверка владельца выполняется в самом UPDATE ... FROM cars
+    updates = [s for s in query_counter if s.startswith("UPDATE deals")]
+    assert len(updates) == 1
+    assert "FROM cars" in updates[0]
+    db_session.refresh(deal)
+    assert deal.status == "pending"
+
 def test_update_deal_status_not_found(client, seller_auth_header):
     """Тест обновления статуса несуществующей сделки"""
     response = client.put(
@@ -97,4 +193,61 @@ def test_update_deal_status_not_found(client, seller_auth_header):
         headers=seller_auth_header
     )
     assert response.status_code == 404
-    assert response.json()["detail"] == "Сделка не найдена"
\ No newline at end of file
+    assert response.json()["detail"] == "Сделка не найдена"
+
+def test_get_my_deals_single_query(client, db_session, test_buyer, test_car, seller_auth_header, query_counter):
+    """Тест: сделки продавца с автомобилями и покупателями выбираются одним запросом"""
+    for day, status in enumerate(["pending", "rejected", "rejected"], start=1):
+        db_session.add(Deal(buyer_id=test_buyer.id, car_id=test_car.id, price=test_car.price,
+                            status=status, deal_date=datetime(2026, 1, day)))
+    db_session.commit()
+
+    query_counter.clear()
+    response = client.get("/deals/my", headers=seller_auth_header)
+    assert response.status_code == 200
+    deals = response.json()
+    assert len(deals) == 3
+    assert deals[0]["buyer"]["name"] == test_buyer.full_name
+    assert len([s for s in query_counter if "FROM deals" in s]) == 1
+
+def test_get_my_deals_cursor_and_filters(client, db_session, test_buyer, test_car, buyer_auth_header):
+    """Тест keyset-пагинации по дате сделки и фильтров по статусу и периоду"""
+    statuses = ["rejected", "pending", "rejected", "completed", "rejected"]
+    deals = []
+    for day, status in enumerate(statuses, start=1):
+        deal = Deal(buyer_id=test_buyer.id, car_id=test_car.id, price=test_car.price,
+                    status=status, deal_date=datetime(2026, 1, day))
+        db_session.add(deal)
+        deals.append(deal)
+    db_session.commit()
+
+    seen = []
+    params = {"pagination": "cursor", "limit": 2}
+    while True:
+        response = client.get("/deals/my", params=params, headers=buyer_auth_header)
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend(deal["id"] for deal in page["items"])
+        if not page["next_cursor"]:
+            break
+        params["cursor"] = page["next_cursor"]
+    # Новые сделки первыми
+    assert seen == [deal.id for deal in reversed(deals)]
+
+    response = client.get("/deals/my", params={"status": "rejected"}, headers=buyer_auth_header)
+    assert [deal["id"] for deal in response.json()] == [deals[4].id, deals[2].id, deals[0].id]
+
+    response = client.get(
+        "/deals/my",
+        params={"date_from": "2026-01-02T00:00:00", "date_to": "2026-01-04T00:00:00"},
+        headers=buyer_auth_header
+    )
+    assert [deal["id"] for deal in response.json()] == [deals[3].id, deals[2].id, deals[1].id]
+
+    response = client.get("/deals/my", params={"status": "archived"}, headers=buyer_auth_header)
+    assert response.status_code == 400
+
+def test_get_my_deals_invalid_limit(client, buyer_auth_header):
+    """Тест: limit=0 в курсорном режиме отклоняется валидацией"""
+    response = client.get("/deals/my", params={"pagination": "cursor", "limit": 0}, headers=buyer_auth_header)
+    assert response.status_code == 422
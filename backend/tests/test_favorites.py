@@ -1,4 +1,7 @@
 import pytest
+from datetime import datetime
+
+from backend.schemas import Car, Favorite
 
 def test_get_favorites(client, test_favorite, buyer_auth_header):
     """Тест получения списка избранных автомобилей"""
@@ -84,4 +87,61 @@ def test_remove_from_favorites_not_in_favorites(client, buyer_auth_header):
         headers=buyer_auth_header
     )
     assert response.status_code == 404
-    assert response.json()["detail"] == "Автомобиль не в избранном"
\ No newline at end of file
+    assert response.json()["detail"] == "Автомобиль не в избранном"
+
+def test_add_to_favorites_single_statement(client, test_car, buyer_auth_header, query_counter):
+    """Тест: добавление в избранное выполняется одной вставкой с ON CONFLICT"""
+    query_counter.clear()
+    response = client.post(f"/favorites/{test_car.id}", headers=buyer_auth_header)
+    assert response.status_code == 200
+    favorite_queries = [s for s in query_counter if "favorites" in s]
+    assert len(favorite_queries) == 1
+    assert "ON CONFLICT" in favorite_queries[0]
+
+def test_listing_favorites_lookup_limited_to_page(client, test_favorite, buyer_auth_header, query_counter):
+    """Тест: отметки избранного в каталоге проверяются только для автомобилей страницы"""
+    query_counter.clear()
+    response = client.get("/cars", headers=buyer_auth_header)
+    assert response.json()[0]["is_favorite"] is True
+    favorite_queries = [s for s in query_counter if "FROM favorites" in s]
+    assert len(favorite_queries) == 1
+    assert "favorites.car_id IN" in favorite_queries[0]
+
+def test_get_favorites_cursor_pagination(client, db_session, test_buyer, test_car, buyer_auth_header, query_counter):
+    """Тест пагинации избранного: автомобили загружаются тем же запросом, сортировка в SQL"""
+    cars = [test_car]
+    for price in (20000, 40000):
+        car = Car(brand="Honda", model="Accord", year=2021, power=200, transmission="automatic",
+                  condition="new", mileage=0, price=price, seller_id=test_car.seller_id)
+        db_session.add(car)
+        cars.append(car)
+    db_session.flush()
+    for minutes, car in enumerate(cars):
+        db_session.add(Favorite(buyer_id=test_buyer.id, car_id=car.id, added_at=datetime(2026, 1, 1, 12, minutes)))
+    db_session.commit()
+
+    seen = []
+    params = {"pagination": "cursor", "limit": 2}
+    query_counter.clear()
+    while True:
+        response = client.get("/favorites", params=params, headers=buyer_auth_header)
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend(fav["id"] for fav in page["items"])
+        if not page["next_cursor"]:
+            break
+        params["cursor"] = page["next_cursor"]
+    # Новые сверху: порядок, обратный добавлению
+    assert seen == [car.id for car in reversed(cars)]
+    assert len([s for s in query_counter if "FROM favorites" in s]) == 2
+
+    response = client.get("/favorites", params={"sort_by": "price", "sort_order": "asc"}, headers=buyer_auth_header)
+    assert [fav["price"] for fav in response.json()] == [20000, 30000, 40000]
+
+    response = client.get("/favorites", params={"sort_by": "color"}, headers=buyer_auth_header)
+    assert response.status_code == 400
+
+def test_get_favorites_invalid_limit(client, buyer_auth_header):
+    """Тест: limit=0 в курсорном режиме отклоняется валидацией"""
+    response = client.get("/favorites", params={"pagination": "cursor", "limit": 0}, headers=buyer_auth_header)
+    assert response.status_code == 422
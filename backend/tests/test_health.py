@@ -6,4 +6,19 @@ def test_health_check(client):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
-    assert "version" in data
\ No newline at end of file
+    assert "version" in data
+
+def test_metrics(client, test_buyer):
+    """Тест метрик пула хеширования паролей"""
+    client.post("/auth/token", data={"username": test_buyer.email, "password": "password"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    hashing = response.json()["password_hashing"]
+    assert hashing["calls"] >= 1
+    assert hashing["queued"] == 0
+    assert "avg_queue_time_ms" in hashing
+
+    database_pool = response.json()["database_pool"]
+    assert "pool_class" in database_pool
+    assert "checkout_timeouts" in database_pool
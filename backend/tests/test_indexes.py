@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import select, text
+
+from backend.schemas import Car
+
+def explain(db_session, stmt):
+    """План выполнения запроса в виде одной строки"""
+    compiled = stmt.compile(db_session.bind, compile_kwargs={"literal_binds": True})
+    if db_session.bind.dialect.name == "postgresql":
+        # На маленькой тестовой таблице планировщик иначе выберет seq scan
+        db_session.execute(text("SET enable_seqscan = off"))
+        rows = db_session.execute(text(f"EXPLAIN {compiled}")).all()
+    else:
+        rows = db_session.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return "\n".join(str(value) for row in rows for value in row)
+
+@pytest.mark.parametrize("stmt, index_name", [
+    (select(Car).where(Car.seller_id == 1), "ix_cars_seller_id"),
+    (select(Car).where(Car.store_id == 1), "ix_cars_store_id"),
+    (select(Car).where(Car.price >= 10000, Car.price <= 20000), "ix_cars_price_id"),
+    (select(Car).where(Car.year >= 2015, Car.year <= 2020), "ix_cars_year_id"),
+    (select(Car).where(Car.mileage <= 30000), "ix_cars_mileage"),
+    (
+        select(Car).where(Car.condition == "used", Car.transmission == "АКП", Car.price <= 20000),
+        "ix_cars_condition_transmission_price",
+    ),
+])
+def test_car_filters_use_indexes(db_session, test_car, stmt, index_name):
+    """Тест: фильтры каталога используют индексы таблицы cars"""
+    assert index_name in explain(db_session, stmt)
+
+def test_car_substring_search_uses_trigram_index(db_session, test_car):
+    """Тест: поиск подстроки по бренду использует триграммный индекс (только PostgreSQL)"""
+    if db_session.bind.dialect.name != "postgresql":
+        pytest.skip("Триграммные индексы доступны только в PostgreSQL")
+    stmt = select(Car).where(Car.brand.ilike("%oyot%"))
+    assert "ix_cars_brand_trgm" in explain(db_session, stmt)
+
+def test_car_full_text_search_uses_gin_index(db_session, test_car):
+    """Тест: полнотекстовый поиск использует GIN-индекс search_vector (только PostgreSQL)"""
+    if db_session.bind.dialect.name != "postgresql":
+        pytest.skip("Полнотекстовый поиск доступен только в PostgreSQL")
+    stmt = select(Car).where(text("search_vector @@ to_tsquery('simple', 'toy:*')"))
+    assert "ix_cars_search_vector" in explain(db_session, stmt)
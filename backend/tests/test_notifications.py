@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+
+from backend.schemas import Buyer, Notification
+from backend.outbox import outbox_dispatcher
+
+def car_row(store_id, **fields):
+    """Строка массовой загрузки, подходящая под предпочтения тестового покупателя"""
+    row = {
+        "brand": "Toyota", "model": "Camry", "year": 2020, "power": 180, "transmission": "automatic",
+        "condition": "new", "mileage": 0, "price": 30000, "store_id": store_id
+    }
+    row.update(fields)
+    return row
+
+def test_new_cars_notify_matching_buyers(client, db_session, test_buyer, test_store, seller_auth_header,
+                                         buyer_auth_header, query_counter):
+    """Тест: новые автомобили сопоставляются с предпочтениями, уведомление — одно на покупателя"""
+    honda_buyer = Buyer(email="honda@test.com", password_hash="x", full_name="Honda Buyer", preferred_brand="Honda")
+    # Покупатель без предпочтений не получает подборок
+    db_session.add_all([honda_buyer, Buyer(email="any@test.com", password_hash="x", full_name="Any Buyer")])
+    db_session.commit()
+
+    rows = [
+        car_row(test_store.id),
+        car_row(test_store.id, price=45000),
+        car_row(test_store.id, brand="Honda", model="Accord"),
+        car_row(test_store.id, status="inactive"),
+        car_row(test_store.id, price=90000),
+    ]
+    ids = client.post("/cars/bulk", json=rows, headers=seller_auth_header).json()["ids"]
+
+    query_counter.clear()
+    assert asyncio.run(outbox_dispatcher.dispatch_once()) == 5
+    # Все уведомления пачки записываются одной вставкой
+    assert len([s for s in query_counter if s.startswith("INSERT INTO notifications")]) == 1
+
+    notifications = {n.buyer_id: n.car_ids for n in db_session.query(Notification).all()}
+    assert notifications == {test_buyer.id: [ids[0], ids[1]], honda_buyer.id: [ids[2]]}
+
+    response = client.get("/notifications", headers=buyer_auth_header)
+    assert response.status_code == 200
+    feed = response.json()
+    assert len(feed) == 1
+    assert feed[0]["kind"] == "new_cars"
+    assert [car["id"] for car in feed[0]["cars"]] == [ids[0], ids[1]]
+    assert feed[0]["read"] is False
+
+    response = client.post("/notifications/read", headers=buyer_auth_header)
+    assert response.json()["updated"] == 1
+    assert client.get("/notifications", params={"unread_only": True}, headers=buyer_auth_header).json() == []
+
+def test_notifications_buyers_only(client, seller_auth_header):
+    """Тест: уведомления доступны только покупателям"""
+    response = client.get("/notifications", headers=seller_auth_header)
+    assert response.status_code == 403
+
+def test_notifications_invalid_limit(client, buyer_auth_header):
+    """Тест: размер страницы уведомлений проверяется до выполнения запроса"""
+    for params in ({"limit": 0}, {"limit": 100000}, {"skip": -1}):
+        response = client.get("/notifications", params=params, headers=buyer_auth_header)
+        assert response.status_code == 422
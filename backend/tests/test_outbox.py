@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+
+from backend.schemas import OutboxEvent
+from backend.outbox import outbox_dispatcher
+
+@pytest.fixture(scope="function")
+def delivered():
+    """Фикстура: потребитель outbox, собирающий доставленные события"""
+    events = []
+
+    async def consumer(db, batch):
+        events.extend((event.event_type, event.aggregate_id) for event in batch)
+
+    outbox_dispatcher.metrics.reset()
+    outbox_dispatcher.subscribe(consumer)
+    yield events
+    outbox_dispatcher.unsubscribe(consumer)
+
+def test_outbox_events_delivered(client, db_session, test_car, buyer_auth_header, seller_auth_header, delivered):
+    """Тест: изменения записывают события в outbox, диспетчер доставляет их один раз"""
+    car_id = client.post("/cars", json={
+        "brand": "Honda", "model": "Civic", "year": 2021, "power": 150, "transmission": "АКП",
+        "condition": "new", "mileage": 0, "price": 25000, "store_id": test_car.store_id
+    }, headers=seller_auth_header).json()["id"]
+    client.post(f"/favorites/{test_car.id}", headers=buyer_auth_header)
+    deal_id = client.post("/deals", params={"car_id": test_car.id}, headers=buyer_auth_header).json()["deal_id"]
+    # Неудачный запрос не оставляет событий
+    client.post("/cars", json={
+        "brand": "Honda", "model": "Civic", "year": 2021, "power": 150, "transmission": "АКП",
+        "condition": "new", "mileage": 0, "price": 25000, "store_id": 9999
+    }, headers=seller_auth_header)
+
+    assert asyncio.run(outbox_dispatcher.dispatch_once()) == 3
+    assert delivered == [("car.created", car_id), ("favorite.added", test_car.id), ("deal.created", deal_id)]
+    assert db_session.query(OutboxEvent).filter(OutboxEvent.processed_at.is_(None)).count() == 0
+
+    assert asyncio.run(outbox_dispatcher.dispatch_once()) == 0
+    assert len(delivered) == 3
+    metrics = client.get("/metrics").json()["outbox"]
+    assert metrics["dispatched"] == 3
+    assert metrics["batches"] == 1
+
+def test_outbox_redelivers_after_failure(client, db_session, test_car, seller_auth_header, delivered):
+    """Тест: при ошибке потребителя событие доставляется повторно (at-least-once)"""
+    failures = []
+
+    async def failing_consumer(db, batch):
+        # Сбой и при доставке пачки, и при повторе по одному событию
+        if len(failures) < 2:
+            failures.append(len(batch))
+            raise RuntimeError("consumer unavailable")
+
+    outbox_dispatcher.subscribe(failing_consumer, event_types=["car.status_changed"])
+    try:
+        client.patch(f"/cars/{test_car.id}/status", json={"status": "inactive"}, headers=seller_auth_header)
+
+        assert asyncio.run(outbox_dispatcher.dispatch_once()) == 0
+        event = db_session.query(OutboxEvent).one()
+        assert (event.event_type, event.payload, event.attempts) == ("car.status_changed", {"status": "inactive"}, 1)
+        assert event.processed_at is None
+        metrics = outbox_dispatcher.metrics.snapshot()
+        assert (metrics["failed_batches"], metrics["failed_events"]) == (1, 1)
+
+        assert asyncio.run(outbox_dispatcher.dispatch_once()) == 1
+        # Остальные потребители получают событие повторно
+        assert delivered == [("car.status_changed", test_car.id)] * 3
+    finally:
+        outbox_dispatcher.unsubscribe(failing_consumer)
+
+def test_outbox_poison_event_does_not_block_batch(client, db_session, test_car, seller_auth_header, delivered):
+    """Тест: сбойное событие не расходует попытки соседних событий пачки"""
+    async def poison_consumer(db, batch):
+        if any(event.payload.get("status") == "inactive" for event in batch):
+            raise RuntimeError("cannot handle inactive")
+
+    outbox_dispatcher.subscribe(poison_consumer, event_types=["car.status_changed"])
+    try:
+        client.patch(f"/cars/{test_car.id}/status", json={"status": "inactive"}, headers=seller_auth_header)
+        client.put(f"/cars/{test_car.id}", json={
+            "brand": "Toyota", "model": "Camry", "year": 2020, "power": 180, "transmission": "automatic",
+            "condition": "new", "mileage": 5000, "price": 29000, "store_id": test_car.store_id
+        }, headers=seller_auth_header)
+
+        for _ in range(outbox_dispatcher.max_attempts + 1):
+            asyncio.run(outbox_dispatcher.dispatch_once())
+
+        events = {event.event_type: event for event in db_session.query(OutboxEvent).all()}
+        assert events["car.updated"].processed_at is not None
+        assert events["car.updated"].attempts == 0
+        assert events["car.status_changed"].processed_at is None
+        assert events["car.status_changed"].attempts == outbox_dispatcher.max_attempts
+        assert ("car.updated", test_car.id) in delivered
+    finally:
+        outbox_dispatcher.unsubscribe(poison_consumer)
+
+def test_outbox_events_on_profile_delete(client, db_session, test_deal, buyer_auth_header, seller_auth_header):
+    """Тест: удаление аккаунта записывает события о каскадно удаленных строках"""
+    deal_id, car_id = test_deal.id, test_deal.car_id
+    client.post(f"/favorites/{car_id}", headers=buyer_auth_header)
+    db_session.query(OutboxEvent).delete()
+    db_session.commit()
+
+    assert client.delete("/users/profile", headers=buyer_auth_header).status_code == 200
+    assert client.delete("/users/profile", headers=seller_auth_header).status_code == 200
+
+    events = [(event.event_type, event.aggregate_id) for event in db_session.query(OutboxEvent).order_by(OutboxEvent.id)]
+    assert events == [
+        ("deal.deleted", deal_id),
+        ("favorite.removed", car_id),
+        ("car.deleted", car_id),
+    ]
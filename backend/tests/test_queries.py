@@ -1,4 +1,7 @@
 import pytest
+from datetime import datetime
+
+from backend.schemas import MarketSnapshot
 
 def test_buyers_for_car(client, test_car, test_buyer):
     """Тест поиска покупателей для автомобиля с заданными параметрами"""
@@ -73,4 +76,110 @@ def test_most_expensive_car(client, test_car, db_session):
     assert response.status_code == 200
     car = response.json()
     assert car["id"] == test_car.id
-    assert car["price"] == test_car.price
\ No newline at end of file
+    assert car["price"] == test_car.price
+
+def test_market_analysis_aggregates(client, test_car, test_buyer):
+    """Тест расчета анализа рынка с разбивкой по брендам и состоянию"""
+    response = client.get("/queries/market-analysis")
+    assert response.status_code == 200
+    analysis = response.json()
+    assert analysis["cars_count"] == 1
+    assert analysis["total_car_value"] == test_car.price
+    assert analysis["buyers_count"] == 1
+    assert analysis["total_buying_power"] == test_buyer.max_price
+
+    brand = next(group for group in analysis["by_brand"] if group["brand"] == test_car.brand)
+    assert brand["cars_count"] == 1
+    assert brand["average_car_price"] == test_car.price
+    assert brand["buyers_count"] == 1
+
+    condition = next(group for group in analysis["by_condition"] if group["condition"] == test_car.condition)
+    assert condition["cars_count"] == 1
+
+def test_market_analysis_snapshot(client, db_session, test_car):
+    """Тест чтения анализа рынка из свежего снимка"""
+    db_session.add(MarketSnapshot(id=1, data={"cars_count": 42}, computed_at=datetime.utcnow()))
+    db_session.commit()
+
+    response = client.get("/queries/market-analysis")
+    assert response.status_code == 200
+    assert response.json()["cars_count"] == 42
+
+    # live=true игнорирует снимок
+    response = client.get("/queries/market-analysis", params={"live": True})
+    assert response.status_code == 200
+    assert response.json()["cars_count"] == 1
+
+def test_market_analysis_snapshot_stale_after_write(client, db_session, test_car, seller_auth_header,
+                                                   buyer_auth_header):
+    """Тест: изменения автомобилей и покупателей удаляют снимок анализа рынка"""
+    db_session.add(MarketSnapshot(id=1, data={"cars_count": 42}, computed_at=datetime.utcnow()))
+    db_session.commit()
+    assert client.get("/queries/market-analysis").json()["cars_count"] == 42
+
+    response = client.delete(f"/cars/{test_car.id}", headers=seller_auth_header)
+    assert response.status_code == 200
+    response = client.get("/queries/market-analysis")
+    assert response.json()["cars_count"] == 0
+    db_session.expire_all()
+    assert db_session.get(MarketSnapshot, 1) is None
+
+    db_session.add(MarketSnapshot(id=1, data={"buyers_count": 42}, computed_at=datetime.utcnow()))
+    db_session.commit()
+    response = client.put("/users/profile", json={"max_price": 50000}, headers=buyer_auth_header)
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert db_session.get(MarketSnapshot, 1) is None
+
+def test_buyers_for_car_index_updates(client, test_car, test_buyer, buyer_auth_header):
+    """Тест: индекс предпочтений обновляется при регистрации и изменении профиля"""
+    params = {
+        "brand": "Honda",
+        "model": "Civic",
+        "year": 2020,
+        "transmission": "automatic",
+        "condition": "used",
+        "price": 20000
+    }
+    response = client.get("/queries/buyers-for-car", params=params)
+    assert response.status_code == 200
+    assert response.json() == []
+
+    response = client.post(
+        "/auth/register/buyer",
+        json={
+            "email": "civic@example.com",
+            "password": "password123",
+            "full_name": "Civic Fan",
+            "contact_info": "555",
+            "preferred_brand": "Honda",
+            "max_price": 25000
+        }
+    )
+    new_buyer_id = response.json()["id"]
+
+    # Покупатель из фикстуры меняет предпочтения на Honda
+    client.put(
+        "/users/profile",
+        json={"preferred_brand": "Honda", "preferred_model": "Civic", "preferred_condition": "used"},
+        headers=buyer_auth_header
+    )
+
+    response = client.get("/queries/buyers-for-car", params=params)
+    assert response.status_code == 200
+    assert [buyer["id"] for buyer in response.json()] == sorted([test_buyer.id, new_buyer_id])
+
+def test_buyers_for_cars_batch(client, test_car, test_buyer):
+    """Тест пакетного поиска покупателей для нескольких автомобилей"""
+    response = client.post("/queries/buyers-for-cars", json={"car_ids": [test_car.id, 9999]})
+    assert response.status_code == 200
+    assert response.json() == [{"car_id": test_car.id, "buyer_ids": [test_buyer.id]}]
+
+def test_cars_for_buyer(client, test_car, test_buyer):
+    """Тест поиска автомобилей по предпочтениям покупателя"""
+    response = client.get("/queries/cars-for-buyer", params={"buyer_id": test_buyer.id})
+    assert response.status_code == 200
+    assert [car["id"] for car in response.json()] == [test_car.id]
+
+    response = client.get("/queries/cars-for-buyer", params={"buyer_id": 9999})
+    assert response.status_code == 404
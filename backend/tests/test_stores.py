@@ -1,5 +1,7 @@
 import pytest
 
+from backend.schemas import Car, Store
+
 def test_get_stores(client, test_store):
     """Тест получения списка магазинов"""
     response = client.get("/stores")
@@ -43,4 +45,36 @@ def test_create_store_unauthorized(client):
             "address": "789 Unknown Street"
         }
     )
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+def test_get_stores_car_stats(client, db_session, test_car, query_counter):
+    """Тест статистики магазинов: счетчики по статусам и цены считаются одним запросом"""
+    db_session.add_all([
+        Car(brand="Honda", model="Civic", year=2019, price=10000, status="sold",
+            seller_id=test_car.seller_id, store_id=test_car.store_id),
+        Car(brand="Honda", model="Jazz", year=2018, price=20000, status="active",
+            seller_id=test_car.seller_id, store_id=test_car.store_id),
+        Store(name="Empty Store", address="Nowhere"),
+    ])
+    db_session.commit()
+
+    query_counter.clear()
+    response = client.get("/stores")
+    assert response.status_code == 200
+    assert len(query_counter) == 1
+    stores = response.json()
+
+    store = stores[0]
+    assert store["cars_count"] == 3
+    assert store["status_counts"] == {"active": 2, "sold": 1, "inactive": 0}
+    assert store["min_price"] == 10000
+    assert store["max_price"] == 30000
+    assert store["average_price"] == 20000
+
+    empty = stores[1]
+    assert empty["cars_count"] == 0
+    assert empty["status_counts"] == {"active": 0, "sold": 0, "inactive": 0}
+    assert empty["min_price"] is None
+
+    response = client.get("/stores?skip=1&limit=1")
+    assert [store["name"] for store in response.json()] == ["Empty Store"]
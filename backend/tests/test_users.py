@@ -87,4 +87,15 @@ def test_delete_seller_profile(client, test_seller, seller_auth_header):
     assert response.json()["message"] == "Пользователь удален"
 
     response = client.get("/users/profile", headers=seller_auth_header)
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+def test_profile_lookup_cached(client, test_buyer, buyer_auth_header, query_counter):
+    """Тест: повторные запросы с тем же токеном не загружают пользователя из БД"""
+    response = client.get("/users/profile", headers=buyer_auth_header)
+    assert response.status_code == 200
+    assert any("FROM buyers" in statement for statement in query_counter)
+
+    query_counter.clear()
+    response = client.get("/users/profile", headers=buyer_auth_header)
+    assert response.status_code == 200
+    assert not any("FROM buyers" in statement for statement in query_counter)